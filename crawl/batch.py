@@ -1,12 +1,36 @@
 # Purpose: Initialize a new batch with ID, folders, and seed search pages.
 
-import json, datetime
+import datetime
+import sys
+import orjson
 from pathlib import Path
-from crawl.settings import CFG, make_batch_dirs, today_ymd
+from typing import Dict, List, Tuple
+from crawl.settings import CFG, make_batch_dirs
+
+def _split_zip_template(tmpl: str) -> Tuple[str, str]:
+    """Split a seed URL template into (prefix, suffix) around its {ZIP} placeholder."""
+    prefix, sep, suffix = tmpl.partition("{ZIP}")
+    if not sep:
+        raise ValueError(f"Seed template has no {{ZIP}} placeholder: {tmpl}")
+    return prefix, suffix
+
+# per-process "latest batch" lookups (cached so batch_id=None stays cheap)
+_LATEST_BATCH_CACHES = (
+    ("crawl.fetch", "_find_latest_batch_id"),
+    ("crawl.parse_detail", "_latest_batch"),
+    ("crawl.extract_search", "_latest_batch"),
+)
+
+def _forget_latest_batch() -> None:
+    """Clear those caches so later batch_id=None calls in this process pick the new batch."""
+    for module, fn in _LATEST_BATCH_CACHES:
+        mod = sys.modules.get(module)  # not imported yet means nothing cached yet
+        if mod is not None:
+            getattr(mod, fn).cache_clear()
 
 def init_batch() -> str:
     """
-    Create new batch folders and seed search pages file.
+    Create new batch folders and seed files (seed_meta.json + search_pages.ndjson).
     Returns: BATCH_ID
     """
     # ---- Derive ZIP list from areas ----
@@ -16,46 +40,54 @@ def init_batch() -> str:
             zip_codes.append({"city": area["city"], "state": area["state"], "zip": z})
 
     # ---- Build search pages (per platform per ZIP) ----
-    search_pages = []
-    for z in zip_codes:
+    # templates are split around {ZIP} once; each URL is then a plain concatenation
+    redfin_pre, redfin_suf = _split_zip_template(CFG["seeds"]["redfin"]["zip_search"])
+    zillow_pre, zillow_suf = _split_zip_template(CFG["seeds"]["zillow"]["zip_search"])
+    search_pages: List[Dict[str, str]] = [None] * (2 * len(zip_codes))  # type: ignore[list-item]
+    for i, z in enumerate(zip_codes):
         zip_code = z["zip"]
         # Redfin ZIP search
-        search_pages.append({
+        search_pages[2 * i] = {
             "platform_id": "redfin",
             "zip": zip_code,
-            "url": CFG["seeds"]["redfin"]["zip_search"].format(ZIP=zip_code)
-        })
+            "url": redfin_pre + zip_code + redfin_suf
+        }
         # Zillow ZIP search
-        search_pages.append({
+        search_pages[2 * i + 1] = {
             "platform_id": "zillow",
             "zip": zip_code,
-            "url": CFG["seeds"]["zillow"]["zip_search"].format(ZIP=zip_code)
-        })
+            "url": zillow_pre + zip_code + zillow_suf
+        }
 
     # ---- Optional hardcoded detail URLs ----
     detail_pages = [{"platform_id": "unknown", "url": u} for u in CFG["seeds"].get("detail_urls", [])]
 
     # ---- Create batch_id and dirs ----
-    TODAY = today_ymd()
+    # one aware UTC timestamp for the whole batch (id date + generated_at)
+    started = datetime.datetime.now(datetime.timezone.utc)
+    TODAY = started.strftime("%Y-%m-%d")
     BATCH_ID = f"{TODAY}_zips{len(zip_codes)}"
     dirs = make_batch_dirs(BATCH_ID)
+    _forget_latest_batch()
 
     # ---- Persist seeds ----
-    seeds_path = dirs["structured"] / "seed_search_pages.json"
-    seeds_path.write_text(json.dumps({
+    # small metadata JSON + one search page per line, so consumers can stream rows
+    meta_path = dirs["structured"] / "seed_meta.json"
+    meta_path.write_bytes(orjson.dumps({
         "batch_id": BATCH_ID,
-        "generated_at": datetime.datetime.utcnow().isoformat() + "Z",
+        "generated_at": started.isoformat().replace("+00:00", "Z"),
         "counts": {
             "zip_total": len(zip_codes),
             "search_pages_total": len(search_pages),
             "detail_pages_total": len(detail_pages)
         },
-        "search_pages": search_pages,
         "detail_pages": detail_pages
-    }, indent=2), encoding="utf-8")
+    }, option=orjson.OPT_INDENT_2))
+    seeds_path = dirs["structured"] / "search_pages.ndjson"
+    seeds_path.write_bytes(b"".join(orjson.dumps(row) + b"\n" for row in search_pages))
 
     print(f"✅ Batch {BATCH_ID} ready at {dirs['base'].resolve()}")
-    print(f"Seeds file: {seeds_path}")
+    print(f"Seeds files: {meta_path}, {seeds_path}")
     return BATCH_ID
 if __name__ == "__main__":
     init_batch()
\ No newline at end of file
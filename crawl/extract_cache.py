@@ -0,0 +1,66 @@
+# Purpose: Content-addressable on-disk cache for Firecrawl extractions.
+# Entries are keyed by sha256(url + prompt + schema) so re-runs with the same
+# prompt/schema skip the paid API, while any prompt/schema change misses.
+
+from __future__ import annotations
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+from crawl.settings import now_utc_iso
+
+DEFAULT_CACHE_DIR = Path("data/extract_cache")
+
+def _len_prefixed(b: bytes) -> bytes:
+    # 8-byte length prefix keeps (url, prompt) boundaries unambiguous before hashing
+    return len(b).to_bytes(8, "big") + b
+
+def schema_bytes(schema: Dict[str, Any]) -> bytes:
+    """Canonical bytes of a JSON schema (compute once and reuse across keys)."""
+    return json.dumps(schema, sort_keys=True).encode("utf-8")
+
+def make_key(url: str, prompt: str, schema_bytes: bytes) -> str:
+    h = hashlib.sha256()
+    h.update(_len_prefixed(url.encode("utf-8")))
+    h.update(_len_prefixed(prompt.encode("utf-8")))
+    h.update(schema_bytes)
+    return h.hexdigest()
+
+class ExtractionCache:
+    """
+    Files live at {root}/{key[:2]}/{key}.json; every hit/put is appended to
+    {root}/audit.log as a UTC-timestamped line.
+    """
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _audit(self, event: str, key: str, url: str) -> None:
+        with self._lock:
+            self.root.mkdir(parents=True, exist_ok=True)
+            with (self.root / "audit.log").open("a", encoding="utf-8") as f:
+                f.write(f"{now_utc_iso()}\t{event}\t{key}\t{url}\n")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        p = self._path(key)
+        if not p.exists():
+            return None
+        try:
+            entry = json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+        self._audit("hit", key, entry.get("url", ""))
+        return entry.get("detail")
+
+    def put(self, key: str, detail: Dict[str, Any], url: str = "") -> None:
+        p = self._path(key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"url": url, "cached_at": now_utc_iso(), "detail": detail}
+        tmp = p.with_name(f"{key}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(p)
+        self._audit("put", key, url)
@@ -4,15 +4,21 @@
 
 from __future__ import annotations
 import os
-import json
+import argparse
 import re
 import time
 import hashlib
+import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from typing import List, Optional, Dict, Any, Tuple
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from firecrawl import FirecrawlApp
 from dotenv import load_dotenv
+from crawl.extract_cache import DEFAULT_CACHE_DIR, ExtractionCache, make_key, schema_bytes
 
 # -----------------------------------------------------------------------------
 # Config
@@ -172,36 +178,60 @@ class ExtractedDetail(BaseModel):
     similar_properties: Optional[List[str]] = None
 
 class ExtractedDetailPage(BaseModel):
-    details: ExtractedDetail
+    details: List[ExtractedDetail]
+
+# schema generation is deterministic; build it once instead of per Firecrawl call
+_DETAIL_SCHEMA: Dict[str, Any] = ExtractedDetailPage.model_json_schema()
+_DETAIL_SCHEMA_BYTES: bytes = schema_bytes(_DETAIL_SCHEMA)
 
 # -----------------------------------------------------------------------------
 # Helpers
 # -----------------------------------------------------------------------------
+# Opaque row ids (not security-sensitive). blake2b is stdlib (ids stay identical
+# across environments) and a 20-byte digest gives the same 40 hex chars directly.
+def _id_digest(key: str) -> str:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=20).hexdigest()
+
 def stable_uuid(*parts: str) -> str:
-    s = "|".join([p for p in parts if p])
-    return hashlib.sha1(s.encode("utf-8")).hexdigest()  # 40 hex chars
+    return _id_digest("|".join([p for p in parts if p]))
+
+_NUM_RE = re.compile(r"[^\d.]")
+# ASCII fast path: delete everything except digits and "." in one C-level translate
+_KEEP_NUM_TABLE = str.maketrans("", "", "".join(chr(c) for c in range(128) if chr(c) not in "0123456789."))
+
+def _strip_num(s: str) -> str:
+    # non-ASCII input (e.g. unicode digits/currency) keeps the regex semantics
+    return s.translate(_KEEP_NUM_TABLE) if s.isascii() else _NUM_RE.sub("", s)
 
 def to_int(x) -> Optional[int]:
     if x is None: return None
-    s = re.sub(r"[^\d\.]", "", str(x))
+    if isinstance(x, (int, float)) and not isinstance(x, bool):
+        try: return int(x)
+        except (ValueError, OverflowError): return None
+    s = _strip_num(str(x))
     if not s: return None
     try: return int(float(s))
-    except: return None
+    except ValueError: return None
 
 def to_float(x) -> Optional[float]:
     if x is None: return None
-    s = re.sub(r"[^\d\.]", "", str(x))
+    if isinstance(x, (int, float)) and not isinstance(x, bool):
+        return float(x)
+    s = _strip_num(str(x))
     if not s: return None
     try: return float(s)
-    except: return None
+    except ValueError: return None
+
+@lru_cache(maxsize=4096)
+def _location_id(street: str, unit: str, city: str, state: str, postal_code: str, lat: str, lng: str) -> str:
+    return _id_digest("|".join((street, unit, city, state, postal_code, lat, lng)))
 
 def make_location_id(addr: Address) -> str:
-    # deterministic id from address + lat/long if present
-    key = "|".join([
+    # deterministic id from address + lat/long if present (memoized per address tuple)
+    return _location_id(
         addr.street or "", addr.unit or "", addr.city or "", addr.state or "",
         addr.postal_code or "", str(addr.latitude or ""), str(addr.longitude or "")
-    ])
-    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+    )
 
 def normalize_detail(d: ExtractedDetail, batch_id: str) -> Dict[str, List[Dict[str, Any]]]:
     platform = (d.platform_id or "").lower().strip() or "unknown"
@@ -210,102 +240,107 @@ def normalize_detail(d: ExtractedDetail, batch_id: str) -> Dict[str, List[Dict[s
     listing_id = stable_uuid(platform, ext or url)
     property_id = listing_id
 
+    # Rows are plain dicts in the field order of the *Row models above: inputs are
+    # already validated by ExtractedDetail, so re-validating per row is wasted work.
+
     # listings
-    L = ListingRow(
-        listing_id=listing_id,
-        property_id=property_id,
-        batch_id=batch_id,
-        platform_id=platform,
-        source_url=url,
-        scraped_timestamp=d.scraped_timestamp,
-        list_date=d.list_date,
-        days_on_market=to_int(d.days_on_market),
-        description=d.description,
-        listing_type=(d.listing_type or "sell"),
-        status=d.status,
-        title=None,
-    ).model_dump()
+    L = {
+        "listing_id": listing_id,
+        "property_id": property_id,
+        "batch_id": batch_id,
+        "platform_id": platform,
+        "source_url": url,
+        "scraped_timestamp": d.scraped_timestamp,
+        "list_date": d.list_date,
+        "days_on_market": to_int(d.days_on_market),
+        "description": d.description,
+        "listing_type": (d.listing_type or "sell"),
+        "status": d.status,
+        "title": None,
+    }
 
     # properties
     addr = d.address or Address()
-    P = PropertyRow(
-        property_id=property_id,
-        street_address=addr.street,
-        unit_number=addr.unit,
-        city=addr.city, state=addr.state, postal_code=addr.postal_code,
-        latitude=addr.latitude, longitude=addr.longitude,
-        interior_area_sqft=to_int(d.interior_area_sqft),
-        lot_size_sqft=to_int(d.lot_size_sqft),
-        year_built=to_int(d.year_built),
-        beds=to_float(d.beds),
-        baths=to_float(d.baths),
-        property_type=d.property_type,
-        property_subtype=d.property_subtype,
-        condition=d.condition,
-        features=(d.features or {}),
-        created_at=d.scraped_timestamp,
-        updated_at=d.scraped_timestamp,
-    ).model_dump()
+    P = {
+        "property_id": property_id,
+        "street_address": addr.street,
+        "unit_number": addr.unit,
+        "city": addr.city, "state": addr.state, "postal_code": addr.postal_code,
+        "latitude": addr.latitude, "longitude": addr.longitude,
+        "interior_area_sqft": to_int(d.interior_area_sqft),
+        "lot_size_sqft": to_int(d.lot_size_sqft),
+        "year_built": to_int(d.year_built),
+        "beds": to_float(d.beds),
+        "baths": to_float(d.baths),
+        "property_type": d.property_type,
+        "property_subtype": d.property_subtype,
+        "condition": d.condition,
+        "features": (d.features or {}),
+        "created_at": d.scraped_timestamp,
+        "updated_at": d.scraped_timestamp,
+    }
 
     # media
-    media_rows: List[Dict[str, Any]] = []
-    for i, u in enumerate((d.images or [])[:50]):
-        media_rows.append(
-            MediaRow(
-                listing_id=listing_id,
-                media_url=u,
-                caption=None,
-                display_order=i,
-                is_primary=(i == 0),
-                created_at=d.scraped_timestamp,
-                media_type="image"
-            ).model_dump()
-        )
+    media_rows: List[Dict[str, Any]] = [
+        {
+            "listing_id": listing_id,
+            "media_url": u,
+            "caption": None,
+            "display_order": i,
+            "is_primary": (i == 0),
+            "created_at": d.scraped_timestamp,
+            "media_type": "image",
+        }
+        for i, u in enumerate((d.images or [])[:50])
+    ]
 
     # agents
-    agent_rows: List[Dict[str, Any]] = []
-    for ag in (d.agents or []):
-        agent_rows.append(AgentRow(
-            listing_id=listing_id,
-            agent_name=(ag.name or None),
-            phone=(ag.phone or None),
-            brokerage=(ag.brokerage or None),
-            email=(ag.email or None),
-        ).model_dump())
+    agent_rows: List[Dict[str, Any]] = [
+        {
+            "listing_id": listing_id,
+            "agent_name": (ag.name or None),
+            "phone": (ag.phone or None),
+            "brokerage": (ag.brokerage or None),
+            "email": (ag.email or None),
+        }
+        for ag in (d.agents or [])
+    ]
 
     # price_history
-    ph_rows: List[Dict[str, Any]] = []
-    for ev in (d.price_history or []):
-        ph_rows.append(PriceHistoryRow(
-            listing_id=listing_id,
-            event_date=ev.event_date,
-            event_type=ev.event_type,
-            price=to_int(ev.price),
-            notes=ev.notes,
-        ).model_dump())
+    ph_rows: List[Dict[str, Any]] = [
+        {
+            "listing_id": listing_id,
+            "event_date": ev.event_date,
+            "event_type": ev.event_type,
+            "price": to_int(ev.price),
+            "notes": ev.notes,
+        }
+        for ev in (d.price_history or [])
+    ]
 
     # locations (dedicated)
     location_id = make_location_id(addr)
-    loc_row = LocationRow(
-        location_id=location_id,
-        street_address=addr.street,
-        unit_number=addr.unit,
-        city=addr.city, state=addr.state, postal_code=addr.postal_code,
-        latitude=addr.latitude, longitude=addr.longitude,
-    ).model_dump()
+    loc_row = {
+        "location_id": location_id,
+        "street_address": addr.street,
+        "unit_number": addr.unit,
+        "city": addr.city, "state": addr.state, "postal_code": addr.postal_code,
+        "latitude": addr.latitude, "longitude": addr.longitude,
+    }
 
     # engagement
-    eng_row = EngagementRow(
-        listing_id=listing_id,
-        views=to_int(d.metrics_views),
-        saves=to_int(d.metrics_saves),
-        shares=to_int(d.metrics_shares),
-    ).model_dump()
+    eng_row = {
+        "listing_id": listing_id,
+        "views": to_int(d.metrics_views),
+        "saves": to_int(d.metrics_saves),
+        "shares": to_int(d.metrics_shares),
+    }
 
     # similar properties
-    sim_rows: List[Dict[str, Any]] = []
-    for su in (d.similar_properties or []):
-        if su: sim_rows.append(SimilarRow(listing_id=listing_id, similar_url=su).model_dump())
+    sim_rows: List[Dict[str, Any]] = [
+        {"listing_id": listing_id, "similar_url": su}
+        for su in (d.similar_properties or []) if su
+    ]
 
     return {
         "listings": [L],
@@ -318,19 +353,27 @@ def normalize_detail(d: ExtractedDetail, batch_id: str) -> Dict[str, List[Dict[s
         "similar_properties": sim_rows,
     }
 
+def normalize_all(details: List[ExtractedDetail], batch_id: str) -> List[Dict[str, List[Dict[str, Any]]]]:
+    """
+    normalize_detail over many details (order preserved). Kept serial: it only
+    builds dicts, so shipping details to a process pool (model_dump, pickle,
+    model_validate in the child) costs ~4x more than the work itself.
+    """
+    return [normalize_detail(d, batch_id) for d in details]
+
 def dump_json(path: Path, rows: List[Dict[str, Any]]) -> None:
+    # rows are plain dicts with str keys (see normalize_detail), serialized in one native call
     path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(rows, f, ensure_ascii=False, indent=2)
+    path.write_bytes(orjson.dumps(rows, option=orjson.OPT_INDENT_2))
 
 # -----------------------------------------------------------------------------
 # Firecrawl prompt & call
 # -----------------------------------------------------------------------------
 PROMPT = """
-You are extracting a SINGLE property detail page into this JSON schema (all fields optional except source_url/address).
+You are extracting one or more property detail pages into this JSON schema (all fields optional except source_url/address).
 
 Return:
-- details: {
+- details: [ one object per page: {
   platform_id, source_url, external_property_id, scraped_timestamp,
   address: { street, unit, city, state, postal_code, latitude, longitude },
   list_price, listing_type, status, list_date, days_on_market,
@@ -343,7 +386,7 @@ Return:
   hoa_fee, property_taxes_annual,
   metrics_views, metrics_saves, metrics_shares,
   similar_properties [array of URLs]
-}
+} ]
 
 Rules:
 - Parse numbers/dates/ids from the page if visible. Do NOT invent.
@@ -353,37 +396,147 @@ Rules:
 - metrics_*: parse visible counts (views/saves/shares) if present.
 - similar_properties: collect visible "similar/nearby" property URLs.
 
-Return exactly one object in "details".
+Return exactly one object per input page in "details", with source_url set to that page's URL.
 """
 
-def extract_one(fc: FirecrawlApp, url: str) -> Optional[ExtractedDetail]:
+class _Throttle:
+    """Thread-safe minimum interval between API calls (simple monotonic limiter)."""
+    def __init__(self, min_interval_sec: float):
+        self.min_interval = max(0.0, min_interval_sec)
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def _url_key(u: str) -> str:
+    return (u or "").strip().rstrip("/").lower()
+
+def _details_list(result: Any) -> List[Dict[str, Any]]:
+    """Normalize a Firecrawl extract result (dict or object) into a list of detail dicts."""
+    if isinstance(result, dict):
+        data = result.get("data") or result
+    else:
+        data = getattr(result, "data", None) or {}
+    details = data.get("details") or data.get("0", {}).get("details")
+    if not details:
+        items = data.get("items") or []
+        details = [it.get("details") for it in items if isinstance(it, dict)]
+    if isinstance(details, dict):
+        details = [details]
+    out: List[Dict[str, Any]] = []
+    for d in details or []:
+        if isinstance(d, list):
+            out.extend(x for x in d if isinstance(x, dict))
+        elif isinstance(d, dict):
+            out.append(d)
+    return out
+
+def _validate_detail(d: Dict[str, Any]) -> Optional[ExtractedDetail]:
+    # one malformed detail only loses itself, not the rest of its (already paid) chunk
+    try:
+        return ExtractedDetail.model_validate(d)
+    except ValidationError as e:
+        print("extract validation error:", d.get("source_url") or "?", e.error_count(), "error(s)")
+        return None
+
+def _extract_uncached(fc: FirecrawlApp, urls: List[str], throttle: Optional[_Throttle] = None) -> List[Optional[ExtractedDetail]]:
+    """
+    Extract a chunk of detail pages with a single Firecrawl call.
+    Results are mapped back to `urls` by source_url, falling back to position.
+    """
+    results: List[Optional[ExtractedDetail]] = [None] * len(urls)
+    if not urls:
+        return results
     try:
+        if throttle:
+            throttle.wait()
         result = fc.extract(
-            [url],
+            urls,
             prompt=PROMPT,
-            schema=ExtractedDetailPage.model_json_schema()
+            schema=_DETAIL_SCHEMA
         )
-        # Normalize Firecrawl result (dict or object)
-        if isinstance(result, dict):
-            data = result.get("data") or result
-        else:
-            data = getattr(result, "data", None) or {}
-        details = data.get("details") or data.get("0", {}).get("details")
-        if not details:
-            items = data.get("items") or []
-            if items and isinstance(items[0], dict):
-                details = items[0].get("details")
-        if not details:
-            return None
-        return ExtractedDetail.model_validate(details)
+        details = _details_list(result)
     except Exception as e:
-        print("extract_one error:", type(e).__name__, e)
-        return None
+        print("extract error:", type(e).__name__, e)
+        return results
+    pos = {_url_key(u): i for i, u in enumerate(urls)}
+    matched = set()
+    for j, d in enumerate(details):
+        i = pos.get(_url_key(d.get("source_url") or ""))
+        if i is not None and results[i] is None:
+            results[i] = _validate_detail(d)
+            matched.add(j)
+    # positional fallback when the API did not echo usable source_urls
+    if len(details) == len(urls):
+        for j, d in enumerate(details):
+            if j not in matched and results[j] is None:
+                results[j] = _validate_detail({**d, "source_url": urls[j]})
+    return results
+
+def extract_many(
+    fc: FirecrawlApp,
+    urls: List[str],
+    throttle: Optional[_Throttle] = None,
+    cache: Optional[ExtractionCache] = None,
+) -> List[Optional[ExtractedDetail]]:
+    """
+    Extract a chunk of detail pages, serving cached extractions first and sending
+    only the misses to Firecrawl. Successful extractions are written back to the cache.
+    """
+    if cache is None:
+        return _extract_uncached(fc, urls, throttle)
+
+    keys = [make_key(u, PROMPT, _DETAIL_SCHEMA_BYTES) for u in urls]
+    results: List[Optional[ExtractedDetail]] = [None] * len(urls)
+    misses: List[int] = []
+    for i, key in enumerate(keys):
+        hit = cache.get(key)
+        if hit is not None:
+            try:
+                results[i] = ExtractedDetail.model_validate(hit)
+                continue
+            except Exception:
+                pass
+        misses.append(i)
+
+    if misses:
+        fresh = _extract_uncached(fc, [urls[i] for i in misses], throttle)
+        for i, det in zip(misses, fresh):
+            if det is not None:
+                results[i] = det
+                cache.put(keys[i], det.model_dump(mode="json"), url=urls[i])
+    return results
+
+def extract_one(fc: FirecrawlApp, url: str) -> Optional[ExtractedDetail]:
+    return extract_many(fc, [url])[0]
+
+def _chunked(seq: List[str], size: int):
+    it = iter(seq)
+    while chunk := list(islice(it, size)):
+        yield chunk
 
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
-def main(batch_id: Optional[str] = None, limit: int = 10, delay_sec: float = 1.0):
+def main(
+    batch_id: Optional[str] = None,
+    limit: int = 10,
+    delay_sec: float = 1.0,
+    chunk_size: int = 20,
+    max_workers: int = 8,
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+):
+    """
+    Extract up to `limit` listing URLs in chunks of `chunk_size` URLs per Firecrawl call,
+    with up to `max_workers` calls in flight and at least `delay_sec` between call starts.
+    Extractions are cached under `cache_dir` (pass None to always hit the API).
+    """
     if not FIRECRAWL_API_KEY:
         raise RuntimeError("Set FIRECRAWL_API_KEY in your environment (.env).")
     fc = FirecrawlApp(api_key=FIRECRAWL_API_KEY)
@@ -393,7 +546,7 @@ def main(batch_id: Optional[str] = None, limit: int = 10, delay_sec: float = 1.0
     urls_path = struct_dir / "listing_urls.json"
     if not urls_path.exists():
         raise FileNotFoundError(f"{urls_path} not found. Run extract_search first.")
-    payload = json.loads(urls_path.read_text(encoding="utf-8"))
+    payload = orjson.loads(urls_path.read_bytes())
     url_rows = payload.get("urls") or []
     urls = [r["source_url"] if isinstance(r, dict) else str(r) for r in url_rows][:limit]
     if not urls:
@@ -406,20 +559,28 @@ def main(batch_id: Optional[str] = None, limit: int = 10, delay_sec: float = 1.0
     media: List[Dict[str, Any]] = []
     agents: List[Dict[str, Any]] = []
     price_history: List[Dict[str, Any]] = []
-    locations: Dict[str, Dict[str, Any]] = {}  # de-duplicate by location_id
+    locations: List[Dict[str, Any]] = []
+    seen_locations: set[str] = set()  # de-duplicate by location_id
     engagement: List[Dict[str, Any]] = []
     similar_properties: List[Dict[str, Any]] = []
 
-    for i, url in enumerate(urls, 1):
+    throttle = _Throttle(delay_sec)
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+    chunks = list(_chunked(urls, max(1, chunk_size)))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as ex:
+        extracted = [d for chunk_dets in ex.map(lambda c: extract_many(fc, c, throttle, cache), chunks) for d in chunk_dets]
+
+    found: List[ExtractedDetail] = []
+    for i, (url, det) in enumerate(zip(urls, extracted), 1):
         print(f"[{i}/{len(urls)}] {url}")
-        det = extract_one(fc, url)
         if not det:
             print("   → no details extracted")
-            time.sleep(delay_sec); continue
+            continue
 
         det.source_url = det.source_url or url
-        rows = normalize_detail(det, batch_id=batch_dir.name)
+        found.append(det)
 
+    for rows in normalize_all(found, batch_id=batch_dir.name):
         listings.extend(rows["listings"])
         properties.extend(rows["properties"])
         media.extend(rows["media"])
@@ -430,27 +591,45 @@ def main(batch_id: Optional[str] = None, limit: int = 10, delay_sec: float = 1.0
         # locations: dedupe by location_id
         for loc in rows["locations"]:
             lid = loc["location_id"]
-            locations[lid] = loc
+            if lid not in seen_locations:
+                seen_locations.add(lid)
+                locations.append(loc)
 
         # similar
         similar_properties.extend(rows["similar_properties"])
 
-        time.sleep(delay_sec)
-
-    # Write JSON arrays
-    dump_json(struct_dir / "listings.json", listings)
-    dump_json(struct_dir / "properties.json", properties)
-    dump_json(struct_dir / "media.json", media)
-    dump_json(struct_dir / "agents.json", agents)
-    dump_json(struct_dir / "price_history.json", price_history)
-    dump_json(struct_dir / "locations.json", list(locations.values()))
-    dump_json(struct_dir / "engagement.json", engagement)
-    dump_json(struct_dir / "similar_properties.json", similar_properties)
+    # Write JSON arrays (independent files; orjson encodes natively, writes overlap on a small pool)
+    tables = {
+        "listings": listings,
+        "properties": properties,
+        "media": media,
+        "agents": agents,
+        "price_history": price_history,
+        "locations": locations,
+        "engagement": engagement,
+        "similar_properties": similar_properties,
+    }
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        futures = [ex.submit(dump_json, struct_dir / f"{name}.json", rows) for name, rows in tables.items()]
+        for fut in futures:
+            fut.result()  # surface write errors
 
     print(f"✅ Wrote JSON files to {struct_dir}")
     print(f"   listings={len(listings)}, properties={len(properties)}, media={len(media)}, agents={len(agents)},")
     print(f"   price_history={len(price_history)}, locations={len(locations)}, engagement={len(engagement)}, similar={len(similar_properties)}")
 
 if __name__ == "__main__":
-    # Run:  python -m src.fc_extract_adapted
-    main(batch_id=None, limit=10, delay_sec=1.0)
+    # Run:  python -m crawl.fc_extract_adapted [--limit 10] [--cache-dir data/extract_cache]
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch-id", default=None)
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--delay-sec", type=float, default=1.0)
+    ap.add_argument("--cache-dir", type=Path, default=DEFAULT_CACHE_DIR)
+    ap.add_argument("--no-cache", action="store_true", help="Always call Firecrawl (skip the extraction cache)")
+    args = ap.parse_args()
+    main(
+        batch_id=args.batch_id,
+        limit=args.limit,
+        delay_sec=args.delay_sec,
+        cache_dir=None if args.no_cache else args.cache_dir,
+    )
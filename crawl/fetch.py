@@ -1,21 +1,40 @@
 # Purpose: Fetch search/detail pages and persist raw HTML + minimal metadata to the batch folders.
 from __future__ import annotations
 
-import json
+import atexit
+import hashlib
+import os
 import random
+import shutil
+import threading
 import time
+import zlib
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain, islice, zip_longest
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from urllib.parse import urlparse
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError, SSLError
+from urllib3.util.retry import Retry
 
 from crawl.settings import (
     CFG,
+    MAX_CONCURRENCY,
+    PER_HOST_CONCURRENCY,
+    COMPRESS_HTML,
+    HEAD_PRECHECK,
+    MAX_HTML_BYTES,
+    PER_HOST_RPS,
+    PRETTY_JSON,
     PROJECT_ROOT,
     REQUEST_TIMEOUT_SEC,
-    SLEEP_RANGE_SEC,
     default_headers,
     make_batch_dirs,
     now_utc_iso,
@@ -23,19 +42,29 @@ from crawl.settings import (
 
 # ============================ paths & helpers ============================
 
+_BATCHES_ROOT = PROJECT_ROOT / "data" / "batches"
+
 def _batches_root() -> Path:
-    return PROJECT_ROOT / "data" / "batches"
+    return _BATCHES_ROOT
 
+@lru_cache(maxsize=1)
 def _find_latest_batch_id() -> Optional[str]:
-    """Return latest batch id by folder mtime (or None if none)."""
+    """
+    Return latest batch id by folder mtime (or None if none). Scanned once per
+    process; _find_latest_batch_id.cache_clear() picks up a newer batch.
+    """
     root = _batches_root()
     if not root.exists():
         return None
-    dirs = [p for p in root.iterdir() if p.is_dir()]
-    if not dirs:
-        return None
-    latest = max(dirs, key=lambda p: p.stat().st_mtime)
-    return latest.name
+    # DirEntry answers is_dir() from readdir and caches its stat: one syscall per entry
+    best_name, best_mtime = None, float("-inf")
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir():
+                mtime = e.stat().st_mtime
+                if mtime > best_mtime:
+                    best_name, best_mtime = e.name, mtime
+    return best_name
 
 def _resolve_dirs(batch_id: Optional[str]) -> Dict[str, Path]:
     """Create (if needed) and return batch dirs dict using batch_id or latest batch."""
@@ -46,28 +75,74 @@ def _resolve_dirs(batch_id: Optional[str]) -> Dict[str, Path]:
     return make_batch_dirs(batch_id)
 
 def _seeds_path(struct_dir: Path) -> Path:
+    """Streamable seeds (one search page per line); falls back to the legacy single JSON."""
+    ndjson = struct_dir / "search_pages.ndjson"
+    if ndjson.exists():
+        return ndjson
     return struct_dir / "seed_search_pages.json"
 
+def iter_seeds(path: Path) -> Iterator[Dict[str, str]]:
+    """Yield search-page rows from a seeds file without loading the whole file when it is NDJSON."""
+    if path.suffix != ".ndjson":
+        # legacy batches: one JSON object with a `search_pages` array
+        yield from orjson.loads(path.read_bytes()).get("search_pages", [])
+        return
+    with path.open("rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+@lru_cache(maxsize=8)
+def _load_seeds(path_str: str, mtime_ns: int) -> Tuple[Dict[str, str], ...]:
+    # keyed by mtime so a rewritten seeds file is read again; rows are shared, don't mutate
+    return tuple(iter_seeds(Path(path_str)))
+
+def _seed_rows(path: Path) -> Tuple[Dict[str, str], ...]:
+    """All search-page rows of a seeds file, parsed once per process (per file version)."""
+    return _load_seeds(str(path), path.stat().st_mtime_ns)
+
+def _infer_platform_id(url: str) -> str:
+    """Return 'zillow' | 'redfin' | 'unknown' from the URL's host (plain string ops, no urlparse)."""
+    parts = url.split("/", 3)
+    host = parts[2].lower() if len(parts) > 2 and parts[1] == "" else ""
+    if "zillow.com" in host:
+        return "zillow"
+    if "redfin.com" in host:
+        return "redfin"
+    return "unknown"
+
 def _detect_platform_from_row(row: Dict[str, str]) -> str:
     """Return 'zillow' | 'redfin' | 'unknown' based on explicit platform_id or URL."""
     p = (row.get("platform_id") or "").lower()
     if p in ("zillow", "redfin"):
         return p
-    u = row.get("url", "")
-    if "zillow.com" in u:
-        return "zillow"
-    if "redfin.com" in u:
-        return "redfin"
-    return "unknown"
+    return _infer_platform_id(row.get("url", ""))
+
+_TRACKING_PARAMS = frozenset({"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid"})
+
+def _canonical_url(url: str) -> str:
+    """
+    Key under which equivalent URLs collapse: lower-cased scheme/host, no
+    fragment, tracking params (utm_*, gclid, ...) dropped, query keys sorted.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.startswith("utm_") and k not in _TRACKING_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), ""))
 
 def _balanced_mix(rows: List[Dict[str, str]], limit: int) -> List[Dict[str, str]]:
     """
     Return a balanced list (≈50/50) between Zillow & Redfin up to `limit`.
     Falls back to what's available if one side is short.
     """
-    z = [r for r in rows if _detect_platform_from_row(r) == "zillow"]
-    r = [r for r in rows if _detect_platform_from_row(r) == "redfin"]
-    o = [r for r in rows if _detect_platform_from_row(r) == "unknown"]
+    z: List[Dict[str, str]] = []
+    r: List[Dict[str, str]] = []
+    o: List[Dict[str, str]] = []
+    bucket = {"zillow": z.append, "redfin": r.append, "unknown": o.append}
+    for row in rows:
+        bucket[_detect_platform_from_row(row)](row)
 
     random.shuffle(z); random.shuffle(r); random.shuffle(o)
 
@@ -75,48 +150,264 @@ def _balanced_mix(rows: List[Dict[str, str]], limit: int) -> List[Dict[str, str]
     take_z = min(max(limit // 2, 1), len(z))
     take_r = min(limit - take_z, len(r))
 
-    mixed: List[Dict[str, str]] = []
-    for i in range(max(take_z, take_r)):
-        if i < take_z:
-            mixed.append(z[i])
-        if len(mixed) >= limit:
-            break
-        if i < take_r:
-            mixed.append(r[i])
-        if len(mixed) >= limit:
-            break
-
-    # fill remaining from unknown, then any leftovers
-    remaining = limit - len(mixed)
-    if remaining > 0:
-        pool = o + z[take_z:] + r[take_r:]
-        mixed.extend(pool[:remaining])
+    # interleave z/r (roundrobin), then fill from unknown and any leftovers
+    mixed: List[Dict[str, str]] = [
+        row for pair in zip_longest(z[:take_z], r[:take_r]) for row in pair if row is not None
+    ]
+    mixed.extend(islice(chain(o, z[take_z:], r[take_r:]), max(0, limit - len(mixed))))
 
     return mixed[:limit]
 
 # ============================ data classes ============================
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FetchResult:
     status: int
     final_url: str
     html_file: str
     meta_file: str
-    resp_file: str
+    manifest_file: str
+    skipped: Optional[str] = None  # why the body was not downloaded (html_file is then "")
 
-# ============================ core fetching ============================
+# ============================ HTTP session ============================
 
-def _infer_platform_id(url: str) -> str:
-    host = urlparse(url).hostname or ""
-    if "zillow.com" in host:
-        return "zillow"
-    if "redfin.com" in host:
-        return "redfin"
-    return "unknown"
+def _build_session() -> requests.Session:
+    """
+    Session with a pooled adapter so keep-alive connections are reused per host.
+    Transient failures (connection errors, 429/5xx) are retried by urllib3 with
+    exponential backoff, honoring the server's Retry-After header.
+    """
+    session = requests.Session()
+    session.headers.update(default_headers())
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,  # keep the last response so it is still saved for inspection
+    )
+    # HTTP/1.1 keep-alive, one pool per host: _host_slot caps in-flight requests
+    # per host at PER_HOST_CONCURRENCY, so that many sockets are all a host ever
+    # needs; pool_block makes any extra caller wait for a warm socket instead of
+    # opening (and then discarding) a fresh TCP/TLS connection
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=PER_HOST_CONCURRENCY, pool_block=True,
+                          max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+def _session() -> requests.Session:
+    """Shared session, built on first use (importing fetch.py opens nothing)."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                _SESSION = _build_session()
+                atexit.register(_SESSION.close)
+    return _SESSION
+
+_CHUNK_SIZE = 64 * 1024
+_JSON_OPT = orjson.OPT_INDENT_2 if PRETTY_JSON else None  # meta files: compact unless debugging
+
+# ============================ file writes ============================
+
+def _copy_prefix(src: BinaryIO, dst: BinaryIO, n: int) -> None:
+    src.seek(0)
+    while n > 0:
+        buf = src.read(min(n, _CHUNK_SIZE))
+        if not buf:
+            break
+        dst.write(buf)
+        n -= len(buf)
+
+def _write_stream_if_changed(chunks: Iterable[bytes], path: str) -> bool:
+    """
+    Stream `chunks` into `path`, leaving an existing byte-identical file untouched.
+    Incoming chunks are compared against the current file as they arrive; writing
+    (to a temp file that then replaces `path`) only starts at the first difference.
+    `path` is only ever replaced once the stream has finished: if reading fails
+    midway the temp file is removed and any previous file is kept as it was.
+    Returns True if `path` was (re)written.
+    """
+    tmp = path + ".part"
+    out: Optional[BinaryIO] = None
+    try:
+        try:
+            old = open(path, "rb")
+        except FileNotFoundError:
+            out = open(tmp, "wb")
+            for chunk in chunks:
+                out.write(chunk)
+        else:
+            same = 0  # leading bytes known identical to the existing file
+            with old:
+                for chunk in chunks:
+                    if out is None:
+                        if old.read(len(chunk)) == chunk:
+                            same += len(chunk)
+                            continue
+                        out = open(tmp, "wb")
+                        _copy_prefix(old, out, same)
+                    out.write(chunk)
+                if out is None:
+                    if old.read(1) == b"":
+                        return False  # identical content: no write at all
+                    # new body is a strict prefix of the old file
+                    out = open(tmp, "wb")
+                    _copy_prefix(old, out, same)
+        out.close()
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.unlink(tmp)
+        raise
+    os.replace(tmp, path)
+    return True
+
+# The small per-page writes (meta file, manifest line) all go through one
+# writer thread. Being the only writer, it appends manifest lines whole; batch
+# fetches also let workers return to the network while it drains.
+_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fetch-writer")
+
+def _persist_page(meta_path: str, meta: bytes, manifest_path: str, line: bytes) -> None:
+    with open(meta_path, "wb") as f:
+        f.write(meta)
+    with open(manifest_path, "ab") as f:
+        f.write(line)
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a byte stream on the fly (no timestamp in the header, so equal input gives equal output)."""
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+def _raw_chunks(r: requests.Response, decode: bool) -> Iterator[bytes]:
+    """
+    r.raw.stream(), with urllib3 read errors re-raised as the requests
+    exceptions iter_content() would give, so callers catching
+    requests.RequestException also see a body that breaks off midway.
+    """
+    try:
+        yield from r.raw.stream(_CHUNK_SIZE, decode_content=decode)
+    except ProtocolError as e:
+        raise requests.exceptions.ChunkedEncodingError(e) from e
+    except DecodeError as e:
+        raise requests.exceptions.ContentDecodingError(e) from e
+    except ReadTimeoutError as e:
+        raise requests.exceptions.ConnectionError(e) from e
+    except SSLError as e:
+        raise requests.exceptions.SSLError(e) from e
+
+def _body_chunks(r: requests.Response, gz: bool) -> Iterator[bytes]:
+    """
+    Response body as it should land on disk: decoded HTML, or gzip when `gz`.
+    A body the server already sent gzip-encoded is passed through as is rather
+    than decoded and compressed again.
+    """
+    if not gz:
+        return _raw_chunks(r, decode=True)
+    if r.headers.get("Content-Encoding", "").strip().lower() == "gzip":
+        return _raw_chunks(r, decode=False)
+    return _gzip_chunks(_raw_chunks(r, decode=True))
+
+# ============================ HTTP validators ============================
+
+class HttpCache:
+    """
+    Per-batch ETag / Last-Modified store ({batch}/http_cache.json), keyed by
+    requested URL, so re-runs send conditional GETs and a 304 reuses the saved
+    HTML instead of downloading it again. Thread-safe; flush() writes it back.
+    The body a validator belongs to is kept under {batch}/http_cache/, named
+    after the URL: raw/ indices get reused by other URLs on later runs, so the
+    raw file itself can't be trusted to still hold this URL's page.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.body_dir = os.fspath(path.with_suffix(""))
+        os.makedirs(self.body_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            self._entries: Dict[str, Dict[str, str]] = orjson.loads(path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            self._entries = {}
+
+    def get(self, url: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            return self._entries.get(url)
+
+    def put(self, url: str, entry: Dict[str, str]) -> None:
+        with self._lock:
+            self._entries[url] = entry
+            self._dirty = True
+
+    def body_path(self, url: str, gz: bool) -> str:
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return f"{self.body_dir}/{name}{'.html.gz' if gz else '.html'}"
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_bytes(orjson.dumps(self._entries))
+            tmp.replace(self.path)
+            self._dirty = False
+
+_http_caches: Dict[Path, HttpCache] = {}
+_http_caches_lock = threading.Lock()
+
+def _http_cache(raw_dir: Path) -> HttpCache:
+    path = raw_dir.parent / "http_cache.json"
+    with _http_caches_lock:
+        cache = _http_caches.get(path)
+        if cache is None:
+            cache = _http_caches[path] = HttpCache(path)
+        return cache
+
+@atexit.register
+def _flush_http_caches() -> None:
+    for cache in list(_http_caches.values()):
+        try:
+            cache.flush()
+        except OSError:
+            pass
+
+def _conditional_headers(entry: Optional[Dict[str, str]]) -> Dict[str, str]:
+    # only revalidate when the HTML we would fall back to is still on disk
+    if not entry or not os.path.exists(entry.get("body_file", "")):
+        return {}
+    h = {}
+    if entry.get("etag"):
+        h["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        h["If-Modified-Since"] = entry["last_modified"]
+    return h
+
+def _reuse_html(src: str, dst: str) -> None:
+    """Make `dst` hold the bytes of `src` (hard link when possible)."""
+    if src == dst:
+        return
+    tmp = dst + ".part"
+    try:
+        os.unlink(tmp)
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+# ============================ core fetching ============================
 
-def _should_retry(status: int) -> bool:
-    """Retry on 429/5xx."""
-    return status in (429,) or (500 <= status <= 599)
 
 def fetch_and_save(
     idx: int,
@@ -124,79 +415,306 @@ def fetch_and_save(
     raw_dir: Path,
     headers: Optional[Dict[str, str]] = None,
     timeout: int = REQUEST_TIMEOUT_SEC,
-    max_retries: int = 2,
     seed_kind: str = "search_or_detail",
 ) -> FetchResult:
     """
     GET one URL and persist:
-      - {idx:04d}_raw.html
+      - {idx:04d}_raw.html ({idx:04d}_raw.html.gz with run.compress_html)
       - {idx:04d}_meta.json
-      - {idx:04d}_response.json
-    Adds platform_id automatically to meta.
-    Retries with exponential backoff on 429/5xx.
+    and append the response snapshot (status, final URL, headers) as one line
+    of raw_dir/manifest.jsonl. Adds platform_id automatically to meta.
+    Retries on 429/5xx/connection errors are handled by the session (see _build_session).
+    The session already sends default_headers(); `headers` only adds/overrides.
+    `raw_dir` must already exist (batch callers create it once up front).
+    Request starts are paced per host; a 429/503 with Retry-After or
+    X-RateLimit-Reset backs that host off for later requests.
+    URLs seen before in this batch are revalidated with If-None-Match /
+    If-Modified-Since; on 304 the previously saved HTML is reused.
+    A 200 response declaring a non-HTML Content-Type or a Content-Length above
+    run.max_html_bytes is not downloaded: only meta/manifest are written, with
+    a `skipped` reason, and any earlier page saved at this index is removed.
+    run.head_precheck checks that with a HEAD first. Non-200 bodies are saved
+    regardless, for inspection.
     """
-    raw_dir.mkdir(parents=True, exist_ok=True)
-    headers = headers or default_headers()
+    res, written = _fetch_and_queue(idx, url, raw_dir, headers, timeout, seed_kind)
+    written.result()
+    return res
 
-    attempt = 0
-    last_exc: Optional[Exception] = None
-    while attempt <= max_retries:
+def _fetch_and_queue(
+    idx: int,
+    url: str,
+    raw_dir: Path,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: int = REQUEST_TIMEOUT_SEC,
+    seed_kind: str = "search_or_detail",
+) -> Tuple[FetchResult, Future]:
+    """
+    fetch_and_save, but the meta/manifest writes are only queued on the writer
+    thread: returns once the HTML is on disk, with the future of those writes
+    (batch fetching waits on it before handing the page on).
+    """
+    host = _host(url)
+    # plain strings from here on: no Path object per file per fetch
+    raw = os.fspath(raw_dir)
+    prefix = f"{raw}/{idx:04d}_"
+
+    if HEAD_PRECHECK:
+        _LIMITER.acquire(host)
+        with _session().head(url, headers=headers, timeout=timeout, allow_redirects=True) as h:
+            reason = _skip_reason(h.headers) if h.status_code == 200 else None
+            if reason:
+                _drop_raw_html(prefix)
+                return _record(idx, url, raw, prefix, h.status_code, h.url, h.headers, None, seed_kind, reason)
+
+    cache = _http_cache(raw_dir)
+    cached = cache.get(url)
+    cond = _conditional_headers(cached)
+    if cond:
+        headers = {**headers, **cond} if headers else cond
+    _LIMITER.acquire(host)
+    with _session().get(url, headers=headers, timeout=timeout, allow_redirects=True, stream=True) as r:
+        status = r.status_code
+        if status in (429, 503):
+            backoff = _retry_after_sec(r.headers)
+            if backoff:
+                _LIMITER.defer(host, backoff)
+
+        final_url = r.url
+        html_path = prefix + ("raw.html.gz" if COMPRESS_HTML else "raw.html")
+        if status == 304 and cond:
+            # not modified: no body on the wire, restore this URL's cached copy
+            # (in whichever form, plain or gzip, it was saved)
+            src = cached["body_file"]
+            html_path = prefix + ("raw.html.gz" if src.endswith(".gz") else "raw.html")
+            _reuse_html(src, html_path)
+            final_url = cached.get("final_url") or r.url
+        else:
+            # headers are in, body not read yet: an oversized / non-HTML page is
+            # never downloaded (closing the response drops the connection); error
+            # bodies are always kept for inspection
+            reason = _skip_reason(r.headers) if status == 200 else None
+            if reason:
+                # this index may hold an earlier fetch's page; it must not be
+                # parsed as the page of the URL that was just skipped
+                _drop_raw_html(prefix)
+                return _record(idx, url, raw, prefix, status, final_url, r.headers, None, seed_kind, reason)
+            # stream HTML bytes to disk (even for non-200 to inspect later) straight
+            # from the socket, gzip/br decoded by urllib3 chunk by chunk (or kept/made
+            # gzip when compressing); an identical existing file from a previous run
+            # is left untouched
+            _write_stream_if_changed(_body_chunks(r, COMPRESS_HTML), html_path)
+            etag, last_mod = r.headers.get("ETag"), r.headers.get("Last-Modified")
+            if status == 200 and (etag or last_mod):
+                # pin this body under the URL's own name (a hard link: raw files are
+                # only ever replaced, never rewritten in place, so it keeps these bytes)
+                body = cache.body_path(url, html_path.endswith(".gz"))
+                _reuse_html(html_path, body)
+                if cached and cached.get("body_file") not in (None, body):
+                    try:
+                        os.unlink(cached["body_file"])
+                    except FileNotFoundError:
+                        pass
+                cache.put(url, {"etag": etag or "", "last_modified": last_mod or "",
+                                "body_file": body, "final_url": r.url})
+
+        # drop a stale copy of this page in the other form so readers see one file
+        try:
+            os.unlink(html_path[:-3] if html_path.endswith(".gz") else html_path + ".gz")
+        except FileNotFoundError:
+            pass
+
+        return _record(idx, url, raw, prefix, status, final_url, r.headers, html_path, seed_kind)
+
+def _drop_raw_html(prefix: str) -> None:
+    for path in (prefix + "raw.html", prefix + "raw.html.gz"):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def _skip_reason(headers) -> Optional[str]:
+    """Why a body should not be downloaded (declared non-HTML or over MAX_HTML_BYTES), else None."""
+    ctype = headers.get("Content-Type", "")
+    if ctype and "html" not in ctype.lower():
+        return f"content-type {ctype.split(';')[0].strip()}"
+    length = headers.get("Content-Length", "")
+    if length.isdigit() and int(length) > MAX_HTML_BYTES:
+        return f"content-length {length}"
+    return None
+
+def _record(idx: int, url: str, raw: str, prefix: str, status: int, final_url: str, resp_headers,
+            html_path: Optional[str], seed_kind: str,
+            skipped: Optional[str] = None) -> Tuple[FetchResult, Future]:
+    """Queue the manifest line + meta file for one fetch; returns its FetchResult and the write's future."""
+    fetched_at = now_utc_iso()
+    meta_path, manifest_path = prefix + "meta.json", raw + "/manifest.jsonl"
+    # response headers snapshot
+    rec = {
+        "idx": idx,
+        "url": url,
+        "status": status,
+        "final_url": final_url,
+        "headers": dict(resp_headers),
+        "fetched_at": fetched_at,
+        "html_file": html_path[len(raw) + 1:] if html_path else None,
+    }
+    if skipped:
+        rec["skipped"] = skipped
+    line = orjson.dumps(rec, option=orjson.OPT_APPEND_NEWLINE)
+
+    # our minimal meta (read back by parse_detail)
+    platform_id = _infer_platform_id(final_url or url)
+    meta = {
+        "requested_url": url,
+        "final_url": final_url,
+        "status": status,
+        "fetched_at": fetched_at,
+        "platform_id": platform_id,
+        "seed_kind": seed_kind,
+        "idx": idx,
+    }
+    if skipped:
+        meta["skipped"] = skipped
+    written = _WRITER.submit(_persist_page, meta_path, orjson.dumps(meta, option=_JSON_OPT), manifest_path, line)
+
+    return FetchResult(status, final_url, html_path or "", meta_path, manifest_path, skipped), written
+
+# ============================ rate limiting ============================
+
+class HostRateLimiter:
+    """
+    Sliding-window limiter keyed by hostname: at most `max_calls` request starts
+    per `period` seconds for each host. Different hosts never wait on each other.
+    `defer(host, seconds)` pushes a host back, e.g. from a Retry-After header.
+    """
+    def __init__(self, rps: float):
+        # rps < 1 becomes one call per 1/rps seconds
+        self.max_calls = max(1, int(rps))
+        self.period = self.max_calls / rps if rps > 0 else 0.0
+        self._starts: Dict[str, deque] = defaultdict(deque)
+        self._blocked_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                starts = self._starts[host]
+                while starts and starts[0] <= now - self.period:
+                    starts.popleft()
+                wait = self._blocked_until.get(host, 0.0) - now
+                if wait <= 0 and len(starts) < self.max_calls:
+                    starts.append(now)
+                    return
+                if wait <= 0:
+                    wait = starts[0] + self.period - now
+            time.sleep(wait)
+
+    def defer(self, host: str, seconds: float) -> None:
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until > self._blocked_until.get(host, 0.0):
+                self._blocked_until[host] = until
+
+_LIMITER = HostRateLimiter(PER_HOST_RPS)
+
+def _host(url: str) -> str:
+    return urlsplit(url).hostname or ""
+
+def _retry_after_sec(headers) -> Optional[float]:
+    """Seconds to back off from Retry-After (delta form) or X-RateLimit-Reset (epoch or delta)."""
+    ra = headers.get("Retry-After")
+    if ra and ra.strip().isdigit():
+        return float(ra)
+    reset = headers.get("X-RateLimit-Reset")
+    if reset:
         try:
-            r = requests.get(url, headers=headers, timeout=timeout, allow_redirects=True)
-            status = r.status_code
-
-            html_path = raw_dir / f"{idx:04d}_raw.html"
-            meta_path = raw_dir / f"{idx:04d}_meta.json"
-            resp_path = raw_dir / f"{idx:04d}_response.json"
-
-            # write HTML (even for non-200 to inspect later)
-            html_path.write_text(r.text or "", encoding="utf-8", errors="ignore")
-
-            # response headers snapshot
-            resp = {"status": status, "final_url": r.url, "headers": dict(r.headers)}
-            resp_path.write_text(json.dumps(resp, indent=2), encoding="utf-8")
-
-            # our minimal meta
-            platform_id = _infer_platform_id(r.url or url)
-            meta = {
-                "requested_url": url,
-                "final_url": r.url,
-                "status": status,
-                "fetched_at": now_utc_iso(),
-                "platform_id": platform_id,
-                "seed_kind": seed_kind,
-                "idx": idx,
-            }
-            meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
-
-            return FetchResult(status, r.url, str(html_path), str(meta_path), str(resp_path))
-
-        except Exception as e:
-            last_exc = e
-            status = 0  # network/exception path
-
-        # retry logic
-        if attempt < max_retries and (status == 0 or _should_retry(status)):
-            backoff = 1.5 ** attempt + random.uniform(0.0, 0.5)
-            time.sleep(backoff)
-            attempt += 1
-            continue
-        break
-
-    # if we exit loop without return, raise last exception or a generic error
-    if last_exc:
-        raise last_exc
-    raise RuntimeError(f"Failed to fetch {url}")
-
-def polite_sleep():
-    lo, hi = SLEEP_RANGE_SEC
-    time.sleep(random.uniform(lo, hi))
+            v = float(reset)
+        except ValueError:
+            return None
+        return max(0.0, v - time.time()) if v > 1e9 else v
+    return None
+
+# ============================ concurrency ============================
+
+MAX_WORKERS = MAX_CONCURRENCY          # global cap on in-flight requests (config run.max_concurrency)
+PER_HOST_LIMIT = PER_HOST_CONCURRENCY  # concurrent requests per hostname (config run.per_host_concurrency)
+
+_host_slots: Dict[str, threading.Semaphore] = defaultdict(lambda: threading.Semaphore(PER_HOST_LIMIT))
+_host_slots_lock = threading.Lock()
+
+def _host_slot(url: str) -> threading.Semaphore:
+    host = _host(url)
+    with _host_slots_lock:
+        return _host_slots[host]
+
+def _fetch_polite(idx: int, url: str, raw_dir: Path, seed_kind: str) -> Tuple[FetchResult, Future]:
+    """
+    Fetch one URL while holding its host slot; pacing is per host (see
+    HostRateLimiter in fetch_and_save) so other hosts keep going. The slot is
+    released once the HTML is saved; meta/manifest writes finish behind it.
+    """
+    with _host_slot(url):
+        return _fetch_and_queue(idx, url, raw_dir, seed_kind=seed_kind)
+
+def _fetch_many(
+    jobs: List[Tuple[int, str]],
+    raw_dir: Path,
+    seed_kind: str,
+    on_written: Optional[Callable[[int, FetchResult], None]] = None,
+) -> List[FetchResult]:
+    """
+    Fetch (idx, url) jobs concurrently on a thread pool.
+    `on_written(idx, result)` is called (on the calling thread) as soon as each
+    page is on disk, so downstream work can start before the batch finishes
+    (not for pages whose body was skipped, see fetch_and_save).
+    Returns FetchResults in job order; failed fetches are logged and skipped.
+    """
+    done = _fetch_indexed(jobs, raw_dir, seed_kind, on_written)
+    return [done[idx] for idx, _ in jobs if idx in done]
+
+def _fetch_indexed(
+    jobs: List[Tuple[int, str]],
+    raw_dir: Path,
+    seed_kind: str,
+    on_written: Optional[Callable[[int, FetchResult], None]] = None,
+) -> Dict[int, FetchResult]:
+    """_fetch_many, returning {idx: FetchResult} for the jobs that succeeded."""
+    total = len(jobs)
+    if not total:
+        return {}
+    # per-batch setup done once, not per URL
+    raw_dir.mkdir(parents=True, exist_ok=True)
+
+    done: Dict[int, FetchResult] = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, total)) as ex:
+        futures = {
+            ex.submit(_fetch_polite, idx, url, raw_dir, seed_kind): (n, idx, url)
+            for n, (idx, url) in enumerate(jobs, start=1)
+        }
+        for fut in as_completed(futures):
+            n, idx, url = futures[fut]
+            try:
+                res, written = fut.result()
+                written.result()  # meta on disk before the page is reported / handed on
+                done[idx] = res
+                note = f" skipped ({res.skipped})" if res.skipped else ""
+                print(f"[{n}/{total}] {res.status}{note} -> {url}")
+            except (requests.RequestException, OSError) as e:
+                # retries are exhausted inside urllib3 by now: the page is given up on;
+                # anything else is a bug and propagates
+                print(f"[{n}/{total}] ERROR {type(e).__name__}: {e}")
+                continue
+            if on_written is not None and not res.skipped:
+                on_written(idx, res)
+    _http_cache(raw_dir).flush()
+    return done
 
 # ============================ public entrypoints ============================
 
 def fetch_first_search_page(batch_id: Optional[str] = None) -> FetchResult:
     """
-    Load seed_search_pages.json of a batch, fetch the first (prefer Zillow if available),
+    Load the seed search pages of a batch, fetch the first (prefer Zillow if available),
     and save it as 0001_* files. Returns FetchResult.
     """
     dirs = _resolve_dirs(batch_id)
@@ -206,23 +724,23 @@ def fetch_first_search_page(batch_id: Optional[str] = None) -> FetchResult:
     if not seeds.exists():
         raise FileNotFoundError(f"Seeds file not found at {seeds}. Run src/batch.py first.")
 
-    payload = json.loads(seeds.read_text(encoding="utf-8"))
-    search_pages: List[Dict[str, str]] = payload.get("search_pages", [])
-    if not search_pages:
+    # Prefer a Zillow page to ensure balance; fallback to first available.
+    rows = _seed_rows(seeds)
+    if not rows:
         raise RuntimeError("No search pages in seeds. Check your config areas/zips.")
-
-    # Prefer a Zillow page to ensure balance; fallback to first available
-    first = next((r for r in search_pages if "zillow.com" in r.get("url", "")), None) or search_pages[0]
+    first = next((row for row in rows if "zillow.com" in row.get("url", "")), rows[0])
     url = first["url"]
 
     # index 1 is reserved for the first search page (0001_* files)
     res = fetch_and_save(1, url, raw_dir, seed_kind="search")
+    _http_cache(raw_dir).flush()
     return res
 
 def fetch_search_pages(batch_id: Optional[str] = None, limit: int = 10) -> List[FetchResult]:
     """
     Fetch multiple search pages from seeds and save as 0001, 0002, ...
     Uses a balanced mix (≈50/50) between Zillow and Redfin when possible.
+    Pages are fetched concurrently (bounded globally and per host).
     Returns list of FetchResult.
     """
     dirs = _resolve_dirs(batch_id)
@@ -232,45 +750,43 @@ def fetch_search_pages(batch_id: Optional[str] = None, limit: int = 10) -> List[
     if not seeds.exists():
         raise FileNotFoundError(f"Seeds file not found at {seeds}. Run src/batch.py first.")
 
-    payload = json.loads(seeds.read_text(encoding="utf-8"))
-    search_pages: List[Dict[str, str]] = payload.get("search_pages", [])
+    search_pages: List[Dict[str, str]] = list(_seed_rows(seeds))
     if not search_pages:
         raise RuntimeError("No search pages in seeds. Check your config areas/zips.")
 
     # Prepare a balanced mix
     mixed = _balanced_mix(search_pages, limit)
 
-    results: List[FetchResult] = []
-    for i, row in enumerate(mixed, start=1):
-        url = row["url"]
-        try:
-            res = fetch_and_save(i, url, raw_dir, seed_kind="search")
-            results.append(res)
-            print(f"[{i}/{limit}] {res.status} -> {url}")
-        except Exception as e:
-            print(f"[{i}/{limit}] ERROR {type(e).__name__}: {e}")
-        polite_sleep()
-    return results
+    jobs = [(i, row["url"]) for i, row in enumerate(mixed, start=1)]
+    return _fetch_many(jobs, raw_dir, seed_kind="search")
 
-def fetch_detail_pages(urls: List[str], batch_id: Optional[str] = None, start_idx: int = 1001) -> List[FetchResult]:
+def fetch_detail_pages(
+    urls: List[str],
+    batch_id: Optional[str] = None,
+    start_idx: int = 1001,
+    on_written: Optional[Callable[[int, FetchResult], None]] = None,
+) -> List[FetchResult]:
     """
     Fetch a list of detail-page URLs and save as 1001, 1002, ...
-    Returns list of FetchResult.
+    Equivalent URLs (see _canonical_url) are fetched once, under the index of
+    their first occurrence; indices stay consecutive over the unique URLs.
+    Pages are fetched concurrently (bounded globally and per host);
+    `on_written(idx, result)` fires as each page lands (see _fetch_many).
+    Returns one FetchResult per input URL (duplicates share theirs);
+    failed fetches are skipped.
     """
     dirs = _resolve_dirs(batch_id)
     raw_dir = dirs["raw"]
 
-    results: List[FetchResult] = []
-    for i, url in enumerate(urls, start=0):
-        idx = start_idx + i
-        try:
-            res = fetch_and_save(idx, url, raw_dir, seed_kind="detail")
-            results.append(res)
-            print(f"[{i+1}] {res.status} -> {url}")
-        except Exception as e:
-            print(f"[{i+1}] ERROR {type(e).__name__}: {e}")
-        polite_sleep()
-    return results
+    keys = [_canonical_url(u) for u in urls]
+    idx_of: Dict[str, int] = {}
+    jobs: List[Tuple[int, str]] = []
+    for key, url in zip(keys, urls):
+        if key not in idx_of:
+            idx_of[key] = start_idx + len(jobs)
+            jobs.append((idx_of[key], url))
+    done = _fetch_indexed(jobs, raw_dir, seed_kind="detail", on_written=on_written)
+    return [done[idx_of[k]] for k in keys if idx_of[k] in done]
 
 # ============================ CLI ============================
 
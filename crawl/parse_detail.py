@@ -3,20 +3,46 @@
 # with schema.org and regex fallbacks
 
 from __future__ import annotations
-import json
+import orjson
+import os
 import re
 import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from bs4 import BeautifulSoup
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+from bs4 import BeautifulSoup, SoupStrainer
 from crawl.settings import (
     make_batch_dirs,
     now_utc_iso,
 )
+from crawl.utils.fast_re import compile_i
+from crawl.utils.raw_io import bulk_read, maybe_gunzip, raw_html_files, raw_html_path
+
+# ---------------------------- regexes ----------------------------
+# compiled once at import; these run on every page / numeric node
+
+_NUM_RE = re.compile(r"[^\d\.]")
+# whole-page fallbacks go through re2 when it is installed (see utils.fast_re)
+_SQFT_RE = compile_i(r'([\d,\.]+)\s*(sq\s*ft|sqft)')
+_PRICE_RE = compile_i(r'Price[:\s]*\$?\s*([\d,\,\.]+)')
+_DOLLAR_RE = compile_i(r'\$[\s]*([\d,]+)')  # no letters, case flag is a no-op
+_BEDS_RE = compile_i(r'(\d+(?:\.\d+)?)\s*beds?')
+_BATHS_RE = compile_i(r'(\d+(?:\.\d+)?)\s*baths?')
+_YEAR_RE = compile_i(r'year\s*built[:\s]*([12]\d{3})')
+
+logger = logging.getLogger(__name__)
+
+_ONLY_SCRIPTS = SoupStrainer("script")
 
 # ---------------------------- helpers ----------------------------
 
+# Cached per process (as is make_batch_dirs): every parse_one_detail call resolves
+# its dirs, and pool workers would otherwise each re-scan data/batches. Call
+# _latest_batch.cache_clear() to pick up new batches.
+@lru_cache(maxsize=1)
 def _latest_batch() -> str:
     root = Path("data/batches")
     latest = max((p for p in root.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime, default=None)
@@ -25,7 +51,8 @@ def _latest_batch() -> str:
     return latest.name
 
 def _resolve_dirs(batch_id: Optional[str]) -> Dict[str, Path]:
-    return make_batch_dirs(batch_id) if batch_id else make_batch_dirs(_latest_batch())
+    # resolve None first so cache keys are always concrete batch ids
+    return make_batch_dirs(batch_id or _latest_batch())
 
 def safe_float(x) -> Optional[float]:
     """Normalize a numeric-like value to float (strip $ , etc.)."""
@@ -33,24 +60,210 @@ def safe_float(x) -> Optional[float]:
         return None
     if isinstance(x, (int, float)):
         return float(x)
-    s = re.sub(r"[^\d\.]", "", str(x))
+    return _safe_float_str(str(x))
+
+# Pages repeat the same few numeric strings ("3", "2.5", "1,250,000") across
+# many nodes; bounded caches keep the regex + float parse to once per value.
+@lru_cache(maxsize=4096)
+def _safe_float_str(s: str) -> Optional[float]:
+    s = _NUM_RE.sub("", s)
     try:
         return float(s) if s else None
     except Exception:
         return None
 
+@lru_cache(maxsize=4096)
+def _to_int_str(s: str) -> Optional[int]:
+    v = _safe_float_str(s)
+    return int(v) if v is not None else None
+
 def to_int(x) -> Optional[int]:
+    if isinstance(x, str):
+        return _to_int_str(x)
     v = safe_float(x)
     return int(v) if v is not None else None
 
-def _read_html_meta(raw_dir: Path, idx: int) -> tuple[str, Dict[str, Any]]:
-    html = (raw_dir / f"{idx:04d}_raw.html").read_text(encoding="utf-8", errors="ignore")
-    meta = json.loads((raw_dir / f"{idx:04d}_meta.json").read_text(encoding="utf-8"))
+def _read_html_meta(raw_dir: Path, idx: int) -> tuple[bytes, Dict[str, Any]]:
+    html = raw_html_path(raw_dir, idx).read_bytes()
+    meta = orjson.loads((raw_dir / f"{idx:04d}_meta.json").read_bytes())
     return html, meta
 
+# ----------------------- JSON tree traversal ----------------------
+
+def _iter_dicts(root: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every dict in a JSON tree in pre-order (same order as a recursive walk),
+    using an explicit stack: no Python frame per node and no recursion limit.
+    """
+    stack = [root]
+    pop, push = stack.pop, stack.extend
+    while stack:
+        n = pop()
+        if isinstance(n, dict):
+            yield n
+            push([v for v in reversed(n.values()) if isinstance(v, (dict, list))])
+        elif isinstance(n, list):
+            push([v for v in reversed(n) if isinstance(v, (dict, list))])
+
+# Per-node field pickers (module level so they are not rebuilt per page).
+# Each one discards a name from `need` once that field is settled so the
+# caller can stop walking as soon as nothing is left to find.
+
+_NEED_FIELDS = frozenset({"id", "addr", "price", "beds", "baths", "sqft", "year"})
+_MAX_PHOTOS = 50
+
+def _addr_complete(a: Dict[str, Any]) -> bool:
+    return bool(a["street"] and a["city"] and a["state"] and a["postal_code"])
+
+def _settle(out: Dict[str, Any], need: set) -> None:
+    # numerics are first-wins: once set, later nodes never change them
+    if out["list_price"] is not None: need.discard("price")
+    if out["beds"] is not None: need.discard("beds")
+    if out["baths"] is not None: need.discard("baths")
+    if out["interior_area_sqft"] is not None: need.discard("sqft")
+    if out["year_built"] is not None: need.discard("year")
+    if "addr" in need and _addr_complete(out["address"]): need.discard("addr")
+
+def _done(out: Dict[str, Any], need: set) -> bool:
+    return not need and len(out["photos"]) >= _MAX_PHOTOS
+
+_REDFIN_ID_KEYS = ("propertyId", "propertyIdStr", "id")
+_REDFIN_ADDR_KEYS = frozenset({"streetLine", "city", "zip", "postalCode", "state", "stateCode", "unitNumber", "unit"})
+_REDFIN_SQFT_KEYS = ("squareFeet", "sqFt", "livingArea", "livingAreaSqFt", "aboveGradeFinishedArea")
+_ZILLOW_ID_KEYS = ("zpid", "zillowId", "propertyId")
+_ZILLOW_ADDR_KEYS = frozenset({"streetAddress", "city", "state", "zipcode", "postalCode", "unitNumber", "unit"})
+_ZILLOW_SQFT_KEYS = ("livingArea", "livingAreaValue", "area", "finishedSqFt", "finishedArea")
+_ZILLOW_PHOTO_KEYS = ("photos", "media", "photoGallery", "hiResImageLink")
+_SCHEMA_ORG_TYPES = ("residence", "singlefamily", "house", "apartment", "offer", "realestatelisting")
+
+def _redfin_fields(n: Dict[str, Any], out: Dict[str, Any], need: set) -> None:
+    get = n.get
+    # id (first match wins)
+    if "id" in need:
+        for k in _REDFIN_ID_KEYS:
+            v = get(k)
+            if v and str(v).isdigit():
+                out["external_property_id"] = str(v)
+                need.discard("id")
+                break
+    # address
+    if "addr" in need and not _REDFIN_ADDR_KEYS.isdisjoint(n):
+        addr = out["address"]
+        addr.update({
+            "street": get("streetLine", addr["street"]),
+            "unit": get("unitNumber") or get("unit") or addr["unit"],
+            "city": get("city", addr["city"]),
+            "state": get("state") or get("stateCode") or addr["state"],
+            "postal_code": str(get("zip") or get("postalCode") or addr["postal_code"] or "").strip() or None,
+        })
+    # numerics
+    out["list_price"] = out["list_price"] or safe_float(get("price") or get("listPrice"))
+    out["beds"]  = out["beds"]  or safe_float(get("beds"))
+    out["baths"] = out["baths"] or safe_float(get("baths") or get("bathsTotal"))
+    if out["interior_area_sqft"] is None:
+        for kk in _REDFIN_SQFT_KEYS:
+            if kk in n:
+                out["interior_area_sqft"] = to_int(get(kk))
+                break
+    yb = get("yearBuilt")
+    if out["year_built"] is None and (isinstance(yb, (int, float)) or (isinstance(yb, str) and yb.isdigit())):
+        out["year_built"] = int(yb)
+    # photos
+    ph = get("photos")
+    if isinstance(ph, list):
+        photos = out["photos"]
+        for p in ph:
+            if isinstance(p, dict):
+                u = p.get("url") or p.get("href") or p.get("src")
+                if u and len(photos) < _MAX_PHOTOS:
+                    photos[u] = None
+    _settle(out, need)
+
+def _zillow_fields(n: Dict[str, Any], out: Dict[str, Any], need: set) -> None:
+    get = n.get
+    # zpid (first match wins)
+    if "id" in need:
+        for k in _ZILLOW_ID_KEYS:
+            v = get(k)
+            if v and str(v).isdigit():
+                out["external_property_id"] = str(v)
+                need.discard("id")
+                break
+    # address
+    if "addr" in need and not _ZILLOW_ADDR_KEYS.isdisjoint(n):
+        addr = out["address"]
+        addr.update({
+            "street": get("streetAddress", addr["street"]),
+            "unit": get("unitNumber") or get("unit") or addr["unit"],
+            "city": get("city", addr["city"]),
+            "state": get("state", addr["state"]),
+            "postal_code": str(get("zipcode") or get("postalCode") or addr["postal_code"] or "").strip() or None,
+        })
+    # numerics
+    out["list_price"] = out["list_price"] or safe_float(get("price") or get("listPrice") or get("priceForHDP"))
+    out["beds"]  = out["beds"]  or safe_float(get("bedrooms") or get("beds"))
+    out["baths"] = out["baths"] or safe_float(get("bathrooms") or get("baths"))
+    if out["interior_area_sqft"] is None:
+        for kk in _ZILLOW_SQFT_KEYS:
+            if kk in n:
+                val = safe_float(get(kk))
+                if val:
+                    out["interior_area_sqft"] = int(val)
+                    break
+    yb = get("yearBuilt")
+    if out["year_built"] is None and yb and (isinstance(yb, (int, float)) or (isinstance(yb, str) and yb.isdigit())):
+        out["year_built"] = int(yb)
+    # photos
+    photos = out["photos"]
+    for key in _ZILLOW_PHOTO_KEYS:
+        v = get(key)
+        if isinstance(v, list):
+            for p in v:
+                if isinstance(p, dict):
+                    u = p.get("url") or p.get("href") or p.get("rawUrl") or p.get("hiRes")
+                    if u and len(photos) < _MAX_PHOTOS:
+                        photos[u] = None
+        elif isinstance(v, str):
+            if v and len(photos) < _MAX_PHOTOS:
+                photos[v] = None
+    _settle(out, need)
+
+def _schema_org_fields(n: Dict[str, Any], out: Dict[str, Any], need: set) -> None:
+    t = str(n.get("@type") or n.get("type") or "").lower()
+    if any(x in t for x in _SCHEMA_ORG_TYPES):
+        offer = n.get("offers") or {}
+        if isinstance(offer, dict):
+            out["list_price"] = out["list_price"] or safe_float(offer.get("price") or offer.get("lowPrice") or offer.get("highPrice"))
+        addr = n.get("address") or {}
+        if "addr" in need and isinstance(addr, dict):
+            out["address"].update({
+                "street": addr.get("streetAddress", out["address"]["street"]),
+                "city": addr.get("addressLocality", out["address"]["city"]),
+                "state": addr.get("addressRegion", out["address"]["state"]),
+                "postal_code": addr.get("postalCode", out["address"]["postal_code"]),
+            })
+        out["beds"]  = out["beds"]  or safe_float(n.get("numberOfRooms") or n.get("bedrooms"))
+        out["baths"] = out["baths"] or safe_float(n.get("bathroomCount") or n.get("bathrooms"))
+        area = n.get("floorSize") or {}
+        if isinstance(area, dict):
+            out["interior_area_sqft"] = out["interior_area_sqft"] or to_int(area.get("value"))
+        imgs = n.get("image")
+        if isinstance(imgs, list):
+            photos = out["photos"]
+            for u in imgs:
+                if isinstance(u, str) and len(photos) < _MAX_PHOTOS:
+                    photos[u] = None
+        elif isinstance(imgs, str) and len(out["photos"]) < _MAX_PHOTOS:
+            out["photos"][imgs] = None
+        _settle(out, need)
+
 # ------------------------- site parsers --------------------------
 
-def parse_redfin(soup: BeautifulSoup, html_text: str) -> Dict[str, Any]:
+def _as_text(html: str | bytes) -> str:
+    # pages arrive as bytes; only the regex fallbacks need them decoded
+    return html.decode("utf-8", errors="ignore") if isinstance(html, bytes) else html
+
+def parse_redfin(soup: BeautifulSoup, html_text: str | bytes) -> Dict[str, Any]:
     """Extract fields from Redfin __NEXT_DATA__ (plus fallbacks)."""
     out = {
         "platform_id": "redfin",
@@ -61,79 +274,46 @@ def parse_redfin(soup: BeautifulSoup, html_text: str) -> Dict[str, Any]:
         "baths": None,
         "interior_area_sqft": None,
         "year_built": None,
-        "photos": [],
+        "photos": {},  # ordered set, capped at _MAX_PHOTOS
     }
 
     nxt = soup.find("script", id="__NEXT_DATA__", type="application/json")
     data = {}
     if nxt and nxt.string:
         try:
-            data = json.loads(nxt.string)
+            data = orjson.loads(str(nxt.string))  # orjson rejects str subclasses (NavigableString)
         except Exception:
             data = {}
 
-    def walk(n):
-        if isinstance(n, dict):
-            # id
-            for k in ("propertyId", "propertyIdStr", "id"):
-                v = n.get(k)
-                if v and str(v).isdigit():
-                    out["external_property_id"] = str(v)
-            # address
-            if any(k in n for k in ("streetLine", "city", "zip", "postalCode", "state", "stateCode", "unitNumber", "unit")):
-                out["address"].update({
-                    "street": n.get("streetLine", out["address"]["street"]),
-                    "unit": n.get("unitNumber") or n.get("unit") or out["address"]["unit"],
-                    "city": n.get("city", out["address"]["city"]),
-                    "state": n.get("state") or n.get("stateCode") or out["address"]["state"],
-                    "postal_code": str(n.get("zip") or n.get("postalCode") or out["address"]["postal_code"] or "").strip() or None,
-                })
-            # numerics
-            out["list_price"] = out["list_price"] or safe_float(n.get("price") or n.get("listPrice"))
-            out["beds"]  = out["beds"]  or safe_float(n.get("beds"))
-            out["baths"] = out["baths"] or safe_float(n.get("baths") or n.get("bathsTotal"))
-            for kk in ("squareFeet", "sqFt", "livingArea", "livingAreaSqFt", "aboveGradeFinishedArea"):
-                if out["interior_area_sqft"] is None and kk in n:
-                    out["interior_area_sqft"] = to_int(n.get(kk))
-                    break
-            yb = n.get("yearBuilt")
-            if out["year_built"] is None and (isinstance(yb, (int, float)) or (isinstance(yb, str) and yb.isdigit())):
-                out["year_built"] = int(yb)
-            # photos
-            if "photos" in n and isinstance(n["photos"], list):
-                for p in n["photos"]:
-                    if isinstance(p, dict):
-                        u = p.get("url") or p.get("href") or p.get("src")
-                        if u and u not in out["photos"]:
-                            out["photos"].append(u)
-            for v in n.values():
-                walk(v)
-        elif isinstance(n, list):
-            for v in n:
-                walk(v)
-
     if data:
-        walk(data)
+        need = set(_NEED_FIELDS)
+        for n in _iter_dicts(data):
+            _redfin_fields(n, out, need)
+            if _done(out, need):
+                break
 
     # Regex fallbacks
+    if out["interior_area_sqft"] is None or out["list_price"] is None:
+        html_text = _as_text(html_text)
     if out["interior_area_sqft"] is None:
-        m = re.search(r'([\d,\.]+)\s*(sq\s*ft|sqft)', html_text, re.I)
+        m = _SQFT_RE.search(html_text)
         if m:
             try:
                 out["interior_area_sqft"] = int(float(m.group(1).replace(",", "")))
             except Exception:
                 pass
     if out["list_price"] is None:
-        m = re.search(r'Price[:\s]*\$?\s*([\d,\,\.]+)', html_text, re.I)
+        m = _PRICE_RE.search(html_text)
         if m:
             try:
                 out["list_price"] = float(m.group(1).replace(",", ""))
             except Exception:
                 pass
 
+    out["photos"] = list(out["photos"])
     return out
 
-def parse_zillow(soup: BeautifulSoup, html_text: str) -> Dict[str, Any]:
+def parse_zillow(soup: BeautifulSoup, html_text: str | bytes) -> Dict[str, Any]:
     """Extract fields from Zillow shared-data/Apollo JSON (plus fallbacks)."""
     out = {
         "platform_id": "zillow",
@@ -144,7 +324,7 @@ def parse_zillow(soup: BeautifulSoup, html_text: str) -> Dict[str, Any]:
         "baths": None,
         "interior_area_sqft": None,
         "year_built": None,
-        "photos": [],
+        "photos": {},  # ordered set, capped at _MAX_PHOTOS
     }
 
     payloads: List[Dict[str, Any]] = []
@@ -155,151 +335,101 @@ def parse_zillow(soup: BeautifulSoup, html_text: str) -> Dict[str, Any]:
         if not txt:
             continue
         try:
-            payloads.append(json.loads(txt))
+            payloads.append(orjson.loads(txt))
         except Exception:
             pass
     # hdpApolloPreloadedData
     apollo = soup.find("script", id="hdpApolloPreloadedData", type="application/json")
     if apollo and apollo.string:
         try:
-            payloads.append(json.loads(apollo.string))
+            payloads.append(orjson.loads(str(apollo.string)))
         except Exception:
             pass
 
-    def walk(n):
-        if isinstance(n, dict):
-            # zpid
-            for k in ("zpid", "zillowId", "propertyId"):
-                v = n.get(k)
-                if v and str(v).isdigit():
-                    out["external_property_id"] = str(v)
-            # address
-            if any(k in n for k in ("streetAddress", "city", "state", "zipcode", "postalCode", "unitNumber", "unit")):
-                out["address"].update({
-                    "street": n.get("streetAddress", out["address"]["street"]),
-                    "unit": n.get("unitNumber") or n.get("unit") or out["address"]["unit"],
-                    "city": n.get("city", out["address"]["city"]),
-                    "state": n.get("state", out["address"]["state"]),
-                    "postal_code": str(n.get("zipcode") or n.get("postalCode") or out["address"]["postal_code"] or "").strip() or None,
-                })
-            # numerics
-            out["list_price"] = out["list_price"] or safe_float(n.get("price") or n.get("listPrice") or n.get("priceForHDP"))
-            out["beds"]  = out["beds"]  or safe_float(n.get("bedrooms") or n.get("beds"))
-            out["baths"] = out["baths"] or safe_float(n.get("bathrooms") or n.get("baths"))
-            for kk in ("livingArea", "livingAreaValue", "area", "finishedSqFt", "finishedArea"):
-                if out["interior_area_sqft"] is None and kk in n:
-                    val = safe_float(n.get(kk))
-                    if val:
-                        out["interior_area_sqft"] = int(val)
-                        break
-            yb = n.get("yearBuilt")
-            if yb and (isinstance(yb, (int, float)) or (isinstance(yb, str) and yb.isdigit())):
-                out["year_built"] = int(yb)
-            # photos
-            for key in ("photos", "media", "photoGallery", "hiResImageLink"):
-                v = n.get(key)
-                if isinstance(v, list):
-                    for p in v:
-                        if isinstance(p, dict):
-                            u = p.get("url") or p.get("href") or p.get("rawUrl") or p.get("hiRes")
-                            if u and u not in out["photos"]:
-                                out["photos"].append(u)
-                elif isinstance(v, str):
-                    if v and v not in out["photos"]:
-                        out["photos"].append(v)
-            for v in n.values():
-                walk(v)
-        elif isinstance(n, list):
-            for v in n:
-                walk(v)
-
+    need = set(_NEED_FIELDS)
     for pl in payloads:
-        walk(pl)
+        for n in _iter_dicts(pl):
+            _zillow_fields(n, out, need)
+            if _done(out, need):
+                break
+        if _done(out, need):
+            break
 
     # Fallbacks
     if out["interior_area_sqft"] is None:
-        m = re.search(r'([\d,\.]+)\s*(sq\s*ft|sqft)', html_text, re.I)
+        m = _SQFT_RE.search(_as_text(html_text))
         if m:
             try:
                 out["interior_area_sqft"] = int(float(m.group(1).replace(",", "")))
             except Exception:
                 pass
 
+    out["photos"] = list(out["photos"])
     return out
 
-def parse_schema_org(soup: BeautifulSoup) -> Dict[str, Any]:
-    """Generic schema.org JSON-LD fallback: price, address, beds/baths/sqft, images."""
-    out = {
-        "external_property_id": None,  # schema.org often lacks explicit listing id
-        "address": {"street": None, "unit": None, "city": None, "state": None, "postal_code": None},
-        "list_price": None, "beds": None, "baths": None, "interior_area_sqft": None, "year_built": None, "photos": []
-    }
+def load_ld_json(soup: BeautifulSoup) -> List[Any]:
+    """Decode every application/ld+json script on the page (invalid ones are skipped)."""
+    out: List[Any] = []
     for sc in soup.find_all("script", type="application/ld+json"):
         try:
-            data = json.loads(sc.string or "{}")
+            out.append(orjson.loads(str(sc.string or "{}")))
         except Exception:
             continue
+    return out
 
-        def walk(n):
-            if isinstance(n, dict):
-                t = str(n.get("@type") or n.get("type") or "").lower()
-                if any(x in t for x in ["residence", "singlefamily", "house", "apartment", "offer", "realestatelisting"]):
-                    offer = n.get("offers") or {}
-                    if isinstance(offer, dict):
-                        out["list_price"] = out["list_price"] or safe_float(offer.get("price") or offer.get("lowPrice") or offer.get("highPrice"))
-                    addr = n.get("address") or {}
-                    if isinstance(addr, dict):
-                        out["address"].update({
-                            "street": addr.get("streetAddress", out["address"]["street"]),
-                            "city": addr.get("addressLocality", out["address"]["city"]),
-                            "state": addr.get("addressRegion", out["address"]["state"]),
-                            "postal_code": addr.get("postalCode", out["address"]["postal_code"]),
-                        })
-                    out["beds"]  = out["beds"]  or safe_float(n.get("numberOfRooms") or n.get("bedrooms"))
-                    out["baths"] = out["baths"] or safe_float(n.get("bathroomCount") or n.get("bathrooms"))
-                    area = n.get("floorSize") or {}
-                    if isinstance(area, dict):
-                        out["interior_area_sqft"] = out["interior_area_sqft"] or to_int(area.get("value"))
-                    imgs = n.get("image")
-                    if isinstance(imgs, list):
-                        out["photos"].extend([u for u in imgs if isinstance(u, str)])
-                    elif isinstance(imgs, str):
-                        out["photos"].append(imgs)
-                for v in n.values():
-                    walk(v)
-            elif isinstance(n, list):
-                for v in n:
-                    walk(v)
-        walk(data)
-
-    # dedupe photos
-    out["photos"] = list(dict.fromkeys(out["photos"]))[:50]
+def parse_schema_org(ld_dicts: List[Any]) -> Dict[str, Any]:
+    """
+    Generic schema.org JSON-LD fallback: price, address, beds/baths/sqft, images.
+    Takes the already-decoded payloads (see load_ld_json) so a page's JSON-LD is
+    found and decoded once however many callers need it.
+    """
+    out = {
+        "external_property_id": None,  # schema.org often lacks explicit listing id
+        "address": {"street": None, "unit": None, "city": None, "state": None, "postal_code": None},
+        "list_price": None, "beds": None, "baths": None, "interior_area_sqft": None, "year_built": None, "photos": {}
+    }
+    need = set(_NEED_FIELDS - {"id"})  # schema.org has no listing id to wait for
+    for data in ld_dicts:
+        for n in _iter_dicts(data):
+            _schema_org_fields(n, out, need)
+            if _done(out, need):
+                break
+        if _done(out, need):
+            break
+
+    out["photos"] = list(out["photos"])
     return out
 
-def parse_regex_text(html_text: str) -> Dict[str, Any]:
-    """Last-resort regex extraction from raw text."""
+def _num_int(s: str) -> int:
+    return int(float(s.replace(",", "")))
+
+def _num_float(s: str) -> float:
+    return float(s.replace(",", ""))
+
+# field -> (pattern, converter of group 1); each pattern stops at its first match
+_TEXT_FIELDS = {
+    "list_price": (_DOLLAR_RE, _num_float),
+    "beds": (_BEDS_RE, safe_float),
+    "baths": (_BATHS_RE, safe_float),
+    "interior_area_sqft": (_SQFT_RE, _num_int),
+    "year_built": (_YEAR_RE, int),
+}
+
+def parse_regex_text(html_text: str, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Last-resort regex extraction from raw text. Pass `fields` to scan only for
+    the values the caller is still missing; each skipped field saves a pass
+    over the whole page.
+    """
     out = {"list_price": None, "beds": None, "baths": None, "interior_area_sqft": None, "year_built": None}
-    m = re.search(r'\$[\s]*([\d,]+)', html_text)
-    if m:
-        try:
-            out["list_price"] = float(m.group(1).replace(",", ""))
-        except Exception:
-            pass
-    m = re.search(r'(\d+(?:\.\d+)?)\s*beds?', html_text, re.I)
-    if m:
-        out["beds"] = safe_float(m.group(1))
-    m = re.search(r'(\d+(?:\.\d+)?)\s*baths?', html_text, re.I)
-    if m:
-        out["baths"] = safe_float(m.group(1))
-    m = re.search(r'([\d,\.]+)\s*(sq\s*ft|sqft)', html_text, re.I)
-    if m:
-        try:
-            out["interior_area_sqft"] = int(float(m.group(1).replace(",", "")))
-        except Exception:
-            pass
-    m = re.search(r'year\s*built[:\s]*([12]\d{3})', html_text, re.I)
-    if m:
-        out["year_built"] = int(m.group(1))
+    for k in (_TEXT_FIELDS if fields is None else fields):
+        rx, conv = _TEXT_FIELDS[k]
+        m = rx.search(html_text)
+        if m:
+            try:
+                out[k] = conv(m.group(1))
+            except Exception:
+                pass
     return out
 
 # --------------------------- core API ---------------------------
@@ -310,29 +440,49 @@ class ParsedRecord:
     data: Dict[str, Any]
     path: Path
 
-def parse_one_detail(idx: int, batch_id: Optional[str] = None) -> ParsedRecord:
+def parse_one_detail(idx: int, batch_id: Optional[str] = None,
+                     preloaded: Optional[tuple[bytes, bytes]] = None, pretty: bool = False,
+                     write: bool = True) -> ParsedRecord:
     """
     Parse one saved detail page (e.g., 1001_raw.html) into structured JSON.
+    `preloaded` is the (html, meta) file bytes when the caller already read them.
+    The JSON is written compact unless `pretty` is set; with write=False nothing
+    is written and the caller owns persisting it to the returned path.
     Returns ParsedRecord with output path.
     """
     dirs = _resolve_dirs(batch_id)
     raw_dir, struct_dir = dirs["raw"], dirs["structured"]
 
     # read files
-    html_text, meta = _read_html_meta(raw_dir, idx)
+    if preloaded is not None:
+        html_bytes, meta = preloaded[0], orjson.loads(preloaded[1])
+    else:
+        html_bytes, meta = _read_html_meta(raw_dir, idx)
+    html_bytes = maybe_gunzip(html_bytes)
     source_url = (meta.get("final_url") or meta.get("requested_url") or "").lower()
-    soup = BeautifulSoup(html_text, "html.parser")
+    # lxml (C) on raw bytes; a fixed encoding skips bs4's charset sniffing.
+    # Every parser only reads <script> payloads, so only those nodes are built.
+    # The page is only decoded to str if a regex fallback actually runs.
+    soup = BeautifulSoup(html_bytes, "lxml", from_encoding="utf-8", parse_only=_ONLY_SCRIPTS)
 
     # choose site parser
     if "redfin.com" in source_url:
-        rec = parse_redfin(soup, html_text)
+        rec = parse_redfin(soup, html_bytes)
         platform = "redfin"
     elif "zillow.com" in source_url:
-        rec = parse_zillow(soup, html_text)
+        rec = parse_zillow(soup, html_bytes)
+        platform = "zillow"
+    elif b"hdpApolloPreloadedData" in html_bytes or b"data-zrr-shared-data-key" in html_bytes:
+        # unknown host: sniff the payload markers instead of running both walks
+        # (Zillow pages also carry __NEXT_DATA__, so check its markers first)
+        rec = parse_zillow(soup, html_bytes)
         platform = "zillow"
+    elif b"__NEXT_DATA__" in html_bytes:
+        rec = parse_redfin(soup, html_bytes)
+        platform = "redfin"
     else:
-        # try both and pick richer
-        a = parse_redfin(soup, html_text); b = parse_zillow(soup, html_text)
+        # no known payload: try both and pick richer
+        a = parse_redfin(soup, html_bytes); b = parse_zillow(soup, html_bytes)
         score_a = sum(v is not None for v in [a["list_price"], a["beds"], a["baths"], a["interior_area_sqft"]])
         score_b = sum(v is not None for v in [b["list_price"], b["beds"], b["baths"], b["interior_area_sqft"]])
         rec = a if score_a >= score_b else b
@@ -340,7 +490,7 @@ def parse_one_detail(idx: int, batch_id: Optional[str] = None) -> ParsedRecord:
 
     # schema.org fallback
     if not any([rec["list_price"], rec["beds"], rec["baths"], rec["interior_area_sqft"]]):
-        srec = parse_schema_org(soup)
+        srec = parse_schema_org(load_ld_json(soup))
         for k in ["list_price", "beds", "baths", "interior_area_sqft", "year_built"]:
             rec[k] = rec[k] if rec[k] is not None else srec.get(k)
         for k in ["street", "unit", "city", "state", "postal_code"]:
@@ -349,9 +499,10 @@ def parse_one_detail(idx: int, batch_id: Optional[str] = None) -> ParsedRecord:
 
     # regex fallback
     if rec["interior_area_sqft"] is None or rec["beds"] is None or rec["baths"] is None or rec["list_price"] is None:
-        rrx = parse_regex_text(html_text)
-        for k in ["list_price", "beds", "baths", "interior_area_sqft", "year_built"]:
-            rec[k] = rec[k] if rec[k] is not None else rrx.get(k)
+        missing = [k for k in _TEXT_FIELDS if rec[k] is None]
+        rrx = parse_regex_text(_as_text(html_bytes), missing)
+        for k in missing:
+            rec[k] = rrx[k]
 
     # build structured JSON (aligned with config spec core groups)
     structured = {
@@ -401,31 +552,86 @@ def parse_one_detail(idx: int, batch_id: Optional[str] = None) -> ParsedRecord:
             structured["listing"]["price_per_sqft"] = None
 
     out_path = dirs["structured"] / f"{idx:04d}.json"
-    out_path.write_text(json.dumps(structured, indent=2), encoding="utf-8")
-    print(f"✅ Parsed {idx} -> {out_path}")
+    if write:
+        out_path.write_bytes(_dump_structured(structured, pretty))
+        logger.info("parsed %d -> %s", idx, out_path)
     return ParsedRecord(idx=idx, data=structured, path=out_path)
 
-def parse_all_details(batch_id: Optional[str] = None, limit: int = 10, start_idx: int = 1001) -> List[ParsedRecord]:
+def _dump_structured(structured: Dict[str, Any], pretty: bool) -> bytes:
+    return orjson.dumps(structured, option=orjson.OPT_INDENT_2 if pretty else None)
+
+def _parse_encoded(idx: int, batch_id: str, preloaded: Optional[tuple[bytes, bytes]],
+                   pretty: bool) -> tuple[ParsedRecord, bytes]:
+    # pool worker: parse and encode here, leave the file write to the parent
+    rec = parse_one_detail(idx, batch_id, preloaded, pretty, write=False)
+    return rec, _dump_structured(rec.data, pretty)
+
+def _write_file(path: Path, blob: bytes) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(blob)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def parse_all_details(batch_id: Optional[str] = None, limit: int = 10, start_idx: int = 1001,
+                      max_workers: Optional[int] = None, pretty: bool = False) -> List[ParsedRecord]:
     """
     Iterate detail files (1001_raw.html, 1002_raw.html, ...) up to `limit`,
-    parse to structured JSON, and return a list of ParsedRecord.
+    parse to structured JSON, and return a list of ParsedRecord (in index order).
+    Pages are independent and CPU-bound, so they are parsed on a process pool;
+    pass max_workers=1 to parse serially in this process. All html/meta files
+    are read up front in one bulk pass so workers never wait on disk, and the
+    outputs are written by a single writer thread here rather than by each
+    worker.
     """
     dirs = _resolve_dirs(batch_id)
     raw_dir = dirs["raw"]
 
     # collect available detail indices (1001_raw.html etc.)
-    files = sorted(raw_dir.glob("1???_raw.html"))[:limit]
+    files = raw_html_files(raw_dir, "1???")[:limit]
     if not files:
         raise FileNotFoundError("No detail raw files found (e.g., 1001_raw.html). Run fetch_detail_pages first.")
 
+    bid = dirs["base"].name
+    indices = [int(f.name[:4]) for f in files]
+    # pages missing their meta file are left to parse_one_detail to report
+    ready = [i for i in indices if (raw_dir / f"{i:04d}_meta.json").exists()]
+    paths = {int(f.name[:4]): f for f in files}
+    blobs = bulk_read([p for i in ready for p in (paths[i], raw_dir / f"{i:04d}_meta.json")])
+    loaded = {i: (blobs[2 * k], blobs[2 * k + 1]) for k, i in enumerate(ready)}
+
     results: List[ParsedRecord] = []
-    for f in files:
-        idx = int(f.name[:4])
-        try:
-            res = parse_one_detail(idx, batch_id=dirs["base"].name)
-            results.append(res)
-        except Exception as e:
-            print(f"[{idx}] ERROR {type(e).__name__}: {e}")
+    if max_workers == 1 or len(indices) == 1:
+        for idx in indices:
+            try:
+                results.append(parse_one_detail(idx, bid, loaded.get(idx), pretty))
+            except Exception as e:
+                logger.error("[%d] %s: %s", idx, type(e).__name__, e)
+        return results
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as ex, \
+            ThreadPoolExecutor(max_workers=1) as writer:
+        futures = {ex.submit(_parse_encoded, idx, bid, loaded.get(idx), pretty): idx for idx in indices}
+        writes = {}
+        for fut in as_completed(futures):
+            try:
+                rec, blob = fut.result()
+            except Exception as e:
+                logger.error("[%d] %s: %s", futures[fut], type(e).__name__, e)
+                continue
+            writes[writer.submit(_write_file, rec.path, blob)] = rec
+        for w in as_completed(writes):
+            rec = writes[w]
+            try:
+                w.result()
+            except OSError as e:
+                logger.error("[%d] write %s: %s", rec.idx, type(e).__name__, e)
+                continue
+            logger.info("parsed %d -> %s", rec.idx, rec.path)
+            results.append(rec)
+    results.sort(key=lambda r: r.idx)
     return results
 
 
@@ -509,4 +715,5 @@ def to_adapted_rows(structured: dict) -> dict:
 
 # ----------------------------- CLI ------------------------------
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     parse_all_details(limit=10)
@@ -3,13 +3,23 @@
 from __future__ import annotations
 import argparse
 import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import List, Optional
 from crawl.fetch import fetch_detail_pages
-from crawl.parse_detail import parse_all_details
+from crawl.parse_detail import parse_all_details, parse_one_detail
 from crawl.settings import now_utc_iso
+from crawl.utils.raw_io import raw_html_files
 from crawl.parse_detail import to_adapted_rows 
 BATCHES_ROOT = Path("data/batches")
+# parse workers start while fetch threads are running; forking a threaded
+# process can hand the child a lock some other thread held, so start them
+# from a clean process instead
+_PARSE_MP = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
 
 def latest_batch() -> Path:
     if not BATCHES_ROOT.exists():
@@ -40,7 +50,7 @@ def load_listing_urls(batch_dir: Path) -> List[str]:
 
 def next_detail_index(raw_dir: Path) -> int:
     """Return the next index for detail files (start at 1001)."""
-    existing = sorted(raw_dir.glob("1???_raw.html"))
+    existing = raw_html_files(raw_dir, "1???")
     if not existing:
         return 1001
     last = max(int(p.name[:4]) for p in existing)
@@ -58,10 +68,37 @@ def fetch_details(n: int, batch_id: Optional[str] = None) -> None:
     fetch_detail_pages(subset, batch_id=batch_dir.name, start_idx=start_idx)
     print("✅ fetch-details done at", now_utc_iso())
 
-def parse_details(limit: int, batch_id: Optional[str] = None) -> None:
+def fetch_and_parse(n: int, batch_id: Optional[str] = None, pretty: bool = False) -> None:
+    """
+    Fetch N detail pages and parse each one as soon as it is on disk.
+    Fetching is network-bound and parsing CPU-bound, so parse work runs on a
+    process pool while the fetch threads keep going; total time is close to
+    the slower of the two stages rather than their sum.
+    """
     batch_dir = latest_batch() if batch_id is None else (BATCHES_ROOT / batch_id)
+    raw_dir = batch_dir / "raw"
+    urls = load_listing_urls(batch_dir)
+
+    start_idx = next_detail_index(raw_dir)
+    subset = urls[:n]
     print(f"Batch: {batch_dir.name}")
-    parse_all_details(batch_id=batch_dir.name, limit=limit)
+    print(f"Fetching + parsing {len(subset)} details starting at idx {start_idx} ...")
+    parsed = {}
+    with ProcessPoolExecutor(mp_context=_PARSE_MP) as ex:
+        def on_written(idx: int, _res) -> None:
+            parsed[ex.submit(parse_one_detail, idx, batch_dir.name, None, pretty)] = idx
+        fetch_detail_pages(subset, batch_id=batch_dir.name, start_idx=start_idx, on_written=on_written)
+        for fut in as_completed(parsed):
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"[{parsed[fut]}] parse ERROR {type(e).__name__}: {e}")
+    print("✅ run done at", now_utc_iso())
+
+def parse_details(limit: int, batch_id: Optional[str] = None, pretty: bool = False) -> None:
+    batch_dir = latest_batch() if batch_id is None else (BATCHES_ROOT / batch_id)
+    print(f"Batch: {batch_dir.name}")
+    parse_all_details(batch_id=batch_dir.name, limit=limit, pretty=pretty)
     print("✅ parse-details done at", now_utc_iso())
 
 def main():
@@ -75,16 +112,19 @@ def main():
     s2.add_argument("--limit", type=int, default=10)
 
     s2.add_argument("--mode", choices=["raw","adapted"], default="raw")
+    s2.add_argument("--pretty", action="store_true", help="Indent structured JSON (default: compact)")
 
-    s3 = sub.add_parser("run", help="Fetch N detail pages then parse them")
+    s3 = sub.add_parser("run", help="Fetch N detail pages and parse each as it lands")
     s3.add_argument("--n", type=int, default=10)
+    s3.add_argument("--pretty", action="store_true", help="Indent structured JSON (default: compact)")
 
     args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     if args.cmd == "fetch-details":
         fetch_details(args.n)
     elif args.cmd == "parse-details":
         if args.mode == "raw":
-            parse_details(args.limit)
+            parse_details(args.limit, pretty=args.pretty)
         else:
             # نقرأ النتائج المُهيكلة الحالية ثم نكتبها JSONL per-table
             from pathlib import Path
@@ -107,7 +147,7 @@ def main():
             print("✅ wrote adapted JSONL files in", struct)
         print("✅ parse-details done at", now_utc_iso())
     elif args.cmd == "run":
-        fetch_details(args.n)
+        fetch_and_parse(args.n, pretty=args.pretty)
     else:
         ap.print_help()
 
@@ -3,8 +3,9 @@
 
 from __future__ import annotations
 import json
-import datetime
 import os
+import time
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any, Tuple
 # import sys
@@ -22,6 +23,7 @@ def get_project_root() -> Path:
         return Path(os.getcwd()).parent
 PROJECT_ROOT = get_project_root()
 CONFIG_PATH = PROJECT_ROOT / "config" / "listings_config.json"
+@lru_cache(maxsize=None)
 def load_config() -> Dict[str, Any]:
     if not CONFIG_PATH.exists():
         raise FileNotFoundError(f"Config not found at {CONFIG_PATH}")
@@ -33,21 +35,35 @@ CFG = load_config()
 REQUEST_TIMEOUT_SEC: int = int(CFG["run"].get("request_timeout_sec", 30))
 SLEEP_RANGE_SEC: Tuple[float, float] = tuple(CFG["run"].get("sleep_range_sec", [1.2, 2.8]))  # (min, max)
 USER_AGENT: str = CFG["run"].get("user_agent", "Mozilla/5.0")
+MAX_CONCURRENCY: int = max(1, int(CFG["run"].get("max_concurrency", 16)))  # in-flight requests overall
+PER_HOST_CONCURRENCY: int = max(1, int(CFG["run"].get("per_host_concurrency", 2)))  # in-flight per hostname
+# requests per second allowed per hostname; defaults to the mean of the old sleep range
+PER_HOST_RPS: float = float(CFG["run"].get("per_host_rps", 2.0 / sum(SLEEP_RANGE_SEC)))
+# store fetched pages as {idx}_raw.html.gz (readers handle both forms)
+COMPRESS_HTML: bool = bool(CFG["run"].get("compress_html", False))
+# responses declaring a bigger body (or a non-HTML type) are not downloaded
+MAX_HTML_BYTES: int = int(CFG["run"].get("max_html_bytes", 5_000_000))
+HEAD_PRECHECK: bool = bool(CFG["run"].get("head_precheck", False))  # HEAD before GET to apply that check
+PRETTY_JSON: bool = bool(CFG["run"].get("pretty_json", False))  # indent per-page meta files (debugging)
 
 # ---------- time helpers ----------
+_ISO_Z_FMT = "%Y-%m-%dT%H:%M:%SZ"
+
 def now_utc_iso() -> str:
     """Return current UTC timestamp as ISO-8601 with Z suffix."""
-    return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    return time.strftime(_ISO_Z_FMT, time.gmtime())
 
 def today_ymd() -> str:
     """Return current UTC date as YYYY-MM-DD."""
-    return datetime.datetime.utcnow().strftime("%Y-%m-%d")
+    return time.strftime("%Y-%m-%d", time.gmtime())
 
 # ---------- batch folders ----------
+@lru_cache(maxsize=32)
 def make_batch_dirs(batch_id: str) -> Dict[str, Path]:
     """
     Create and return batch directory paths.
     Returns dict: {'base','raw','structured','qa'}
+    Cached per batch_id, so the mkdirs run once per process (treat the dict as read-only).
     """
     base = PROJECT_ROOT / "data" / "batches" / batch_id
     raw = base / "raw"
@@ -58,14 +74,28 @@ def make_batch_dirs(batch_id: str) -> Dict[str, Path]:
     return {"base": base, "raw": raw, "structured": structured, "qa": qa}
 
 # ---------- HTTP headers ----------
+try:  # urllib3 can only decode brotli bodies when a brotli module is installed
+    import brotli  # noqa: F401
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        _ACCEPT_ENCODING = "gzip, deflate"
+
+_DEFAULT_HEADERS: Dict[str, str] = {
+    "User-Agent": USER_AGENT,
+    "Accept-Encoding": _ACCEPT_ENCODING,
+    "Accept-Language": "en-US,en;q=0.9",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "DNT": "1",
+}
+
 def default_headers() -> Dict[str, str]:
     """
-    Build polite default headers for GET requests.
+    Polite default headers for GET requests. Built once at import; the same
+    dict is returned every call, so copy it before changing anything.
     """
-    return {
-        "User-Agent": USER_AGENT,
-        "Accept-Language": "en-US,en;q=0.9",
-        "Cache-Control": "no-cache",
-        "Pragma": "no-cache",
-        "DNT": "1",
-    }
\ No newline at end of file
+    return _DEFAULT_HEADERS
\ No newline at end of file
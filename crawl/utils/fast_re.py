@@ -0,0 +1,16 @@
+import re
+
+try:  # optional: google-re2 (linear-time, ~3-4x faster on full-page scans)
+    import re2 as _re2
+except ImportError:
+    _re2 = None
+
+def compile_i(pattern):
+    """
+    Case-insensitive compile for patterns run over whole pages. Uses re2 when
+    installed, stdlib re otherwise; patterns must stay within the re2 subset
+    (no backreferences or lookarounds). str and bytes patterns both work.
+    """
+    if _re2 is not None:
+        return _re2.compile((b"(?i)" if isinstance(pattern, bytes) else "(?i)") + pattern)
+    return re.compile(pattern, re.I)
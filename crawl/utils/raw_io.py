@@ -0,0 +1,59 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+_FADV_WILLNEED = getattr(os, "POSIX_FADV_WILLNEED", None)
+_GZIP_MAGIC = b"\x1f\x8b"
+
+def _prefetch(path: Path) -> None:
+    # hint the kernel to start readahead for the whole file; no-op where unsupported
+    if _FADV_WILLNEED is None:
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, _FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def bulk_read(paths: Sequence[Path], max_workers: int = 8) -> List[bytes]:
+    """
+    Read many files at once, returning their bytes in the order given.
+    All reads are queued up front (readahead hint + a small thread pool, since
+    file reads release the GIL), so a batch costs roughly one round of disk
+    latency instead of one per file. A single path is just read directly.
+    """
+    paths = [Path(p) for p in paths]
+    if len(paths) <= 1:
+        return [p.read_bytes() for p in paths]
+    for p in paths:
+        _prefetch(p)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as ex:
+        return list(ex.map(Path.read_bytes, paths))
+
+# ---------- saved pages: {idx}_raw.html, or {idx}_raw.html.gz when stored compressed ----------
+
+def maybe_gunzip(data: bytes) -> bytes:
+    """Decompress `data` if it is a gzip stream; plain HTML is returned as is."""
+    return gzip.decompress(data) if data[:2] == _GZIP_MAGIC else data
+
+def raw_html_path(raw_dir: Path, idx: int) -> Path:
+    gz = raw_dir / f"{idx:04d}_raw.html.gz"
+    return gz if gz.exists() else raw_dir / f"{idx:04d}_raw.html"
+
+def raw_html_files(raw_dir: Path, pattern: str) -> List[Path]:
+    """
+    Saved pages whose 4-digit index matches `pattern` (e.g. "1???"), one path
+    per index in index order; a compressed copy wins over a plain one.
+    """
+    found: Dict[str, Path] = {}
+    for p in chain(raw_dir.glob(f"{pattern}_raw.html"), raw_dir.glob(f"{pattern}_raw.html.gz")):
+        found[p.name[:4]] = p
+    return [found[k] for k in sorted(found)]
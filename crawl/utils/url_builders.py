@@ -1,5 +1,6 @@
 from urllib.parse import quote
 import random
+from itertools import zip_longest
 
 def _slug_city(city: str) -> str:
     return city.replace(" ", "-")
@@ -26,17 +27,21 @@ def build_redfin_urls(zips, cities_states, seeds, city_ids: dict | None = None):
         urls.append(seeds["redfin"]["city_search"].format(CITY_ID=cid, CITY=_slug_city(city), STATE=state))
     return urls
 
-def balanced_mix(zips, cities_states, seeds, city_ids, total=10, per_platform_min=5):
+def balanced_mix(zips, cities_states, seeds, city_ids, total=10, per_platform_min=5, seed=None):
     z = build_zillow_urls(zips, cities_states, seeds)
     r = build_redfin_urls(zips, cities_states, seeds, city_ids)
-    random.shuffle(z); random.shuffle(r)
+    # pass `seed` for a reproducible mix; default keeps the global RNG
+    rng = random.Random(seed) if seed is not None else random
+    rng.shuffle(z); rng.shuffle(r)
 
     take_z = min(max(per_platform_min, total // 2), len(z))
-    take_r = min(total - take_z, len(r))
-    mixed = []
-    for i in range(max(take_z, take_r)):
-        if i < take_z: mixed.append(("zillow", z[i]))
-        if len(mixed) >= total: break
-        if i < take_r: mixed.append(("redfin", r[i]))
-        if len(mixed) >= total: break
+    take_r = max(0, min(total - take_z, len(r)))
+    # interleave zillow/redfin pairwise; the shorter side just runs out
+    pairs = zip_longest(z[:take_z], r[:take_r])
+    mixed = [
+        (platform, u)
+        for zu, ru in pairs
+        for platform, u in (("zillow", zu), ("redfin", ru))
+        if u is not None
+    ]
     return mixed[:total]